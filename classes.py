@@ -1,59 +1,450 @@
 from __future__ import annotations
 
-from typing import Any, Union
+import sys
+from collections import deque
+from typing import Any, Optional, Union
 
 import networkx as nx
+import numpy as np
+
+# Columns stored as interned enums rather than free text.
+ENUM_COLUMNS = ("Range", "Tags")
+
+# Spellings accepted for the cells of a Yes/No flag column.
+FLAG_VALUES = {"yes": True, "no": False}
 
 class _Vertex:
+    """
+    A vertex of a Graph. Vertices use __slots__ and refer to their neighbours by integer id, so that graphs
+    over the whole catalogue stay small.
+
+    While the graph is being built, neighbours maps the id of each neighbour to the weight of the edge; once
+    the graph is frozen, it is a read-only slice of the graph's shared adjacency array.
+    """
+    __slots__ = ("item", "kind", "neighbours", "effective_ranges", "skill", "id")
+
     item: Any
     kind: str
-    neighbours: set['_Vertex']
+    neighbours: Union[dict[int, float], np.ndarray]
     effective_ranges: list[str]  # Change to list of strings
     skill: str
+    id: int
 
-    def __init__(self, item: Any, kind: str, skill: str, effective_ranges: list[str] = None) -> None:
+    def __init__(self, item: Any, kind: str, skill: str, effective_ranges: list[str] = None,
+                 vertex_id: int = 0) -> None:
         self.item = item
-        self.kind = kind
-        self.neighbours = set()
-        self.effective_ranges = effective_ranges if effective_ranges is not None else []
-        self.skill = skill
+        self.kind = sys.intern(kind)
+        self.neighbours = {}
+        self.effective_ranges = [sys.intern(r) for r in effective_ranges] if effective_ranges is not None else []
+        self.skill = sys.intern(skill)
+        self.id = vertex_id
 
     def degree(self) -> int:
         return len(self.neighbours)
 
+
 class Graph:
+    """
+    An undirected graph of items, with a weight on every edge.
+
+    Vertices get consecutive integer ids in the order they are added. Calling freeze converts the adjacency
+    into compressed sparse row arrays, where the neighbours of the vertex with id i are
+    indices[indptr[i]:indptr[i + 1]] and the weights of those edges are the same slice of weights;
+    add_vertex and add_edge keep working on a frozen graph.
+
+    The networkx graphs returned by to_networkx are cached, and add_vertex and add_edge update them in place
+    when they can, or drop them when they cannot.
+
+    Instance Attributes:
+        - vertices: the vertices, keyed by item
+        - order: the vertices, by id
+        - frozen: whether the adjacency is stored in indptr and indices
+        - indptr: where the neighbours of each vertex start in indices, once frozen
+        - indices: the ids of the neighbours of every vertex, once frozen
+        - weights: the weight of each edge in indices, once frozen
+    """
     vertices: dict[Any, _Vertex]
+    order: list[_Vertex]
+    frozen: bool
+    indptr: Optional[np.ndarray]
+    indices: Optional[np.ndarray]
+    weights: Optional[np.ndarray]
+    _networkx: dict[tuple[int, str], nx.Graph]
 
     def __init__(self) -> None:
         self.vertices = {}
+        self.order = []
+        self.frozen = False
+        self.indptr = None
+        self.indices = None
+        self.weights = None
+        self._networkx = {}
 
     def add_vertex(self, item: Any, kind: str, ranges: list[str], skill: str) -> None:
         if item not in self.vertices:
-            self.vertices[item] = _Vertex(item, kind, skill, ranges)
+            vertex = _Vertex(item, kind, skill, ranges, len(self.order))
+            self.vertices[item] = vertex
+            self.order.append(vertex)
+
+            # a new vertex has no neighbours, so it only needs an empty row
+            if self.frozen:
+                self.indptr = np.append(self.indptr, self.indptr[-1])
+                vertex.neighbours = self.indices[0:0]
 
-    def add_edge(self, item1: Any, item2: Any) -> None:
+            # cached networkx graphs that hold every vertex and have room to spare just gain a node
+            for key, graph_nx in list(self._networkx.items()):
+                if len(graph_nx) == len(self.order) - 1 and len(graph_nx) < key[0]:
+                    graph_nx.add_node(item, **_node_attributes(vertex))
+                else:
+                    del self._networkx[key]
+
+    def add_edge(self, item1: Any, item2: Any, weight: float = 1.0) -> None:
         if item1 in self.vertices and item2 in self.vertices:
+            if self.frozen:
+                self.thaw()
+
             v1 = self.vertices[item1]
             v2 = self.vertices[item2]
 
-            v1.neighbours.add(v2)
-            v2.neighbours.add(v1)
+            v1.neighbours[v2.id] = weight
+            v2.neighbours[v1.id] = weight
+
+            # a new edge can change which vertices a cut-off networkx graph keeps, so only complete ones are kept
+            for key, graph_nx in list(self._networkx.items()):
+                if len(graph_nx) == len(self.order):
+                    graph_nx.add_edge(item1, item2, weight=weight)
+                else:
+                    del self._networkx[key]
         else:
             raise ValueError
 
-    def to_networkx(self, maxvertices: int = 5000) -> nx.Graph:
+    def weighted_neighbours(self, item: Any) -> list[tuple[Any, float]]:
+        """
+        Returns the neighbours of item with the weights of their edges, heaviest first.
+
+        Raises a ValueError if item is not in the graph.
+        """
+        if item not in self.vertices:
+            raise ValueError
+
+        pairs = self._pairs(self.vertices[item].id)
+        return sorted(((self.order[u].item, weight) for u, weight in pairs), key=lambda pair: -pair[1])
+
+    def _pairs(self, vertex_id: int) -> list[tuple[int, float]]:
+        """Returns the id and edge weight of every neighbour of the vertex with the given id."""
+        if self.frozen:
+            start, end = self.indptr[vertex_id], self.indptr[vertex_id + 1]
+            return list(zip(self.indices[start:end].tolist(), self.weights[start:end].tolist()))
+
+        return list(self.order[vertex_id].neighbours.items())
+
+    def degrees(self) -> np.ndarray:
+        """Returns the degree of every vertex, by id."""
+        if self.frozen:
+            return np.diff(self.indptr)
+
+        return np.array([len(v.neighbours) for v in self.order], dtype=np.int64)
+
+    def freeze(self) -> None:
+        """
+        Stores the adjacency of the graph in indptr, indices and weights, and replaces the neighbours of every
+        vertex with its slice of indices.
+        """
+        if self.frozen:
+            return
+
+        counts = np.array([len(v.neighbours) for v in self.order], dtype=np.int64)
+        self.indptr = np.zeros(len(self.order) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+        self.indices = np.fromiter((u for v in self.order for u in sorted(v.neighbours)), dtype=np.int32,
+                                   count=int(self.indptr[-1]))
+        self.weights = np.fromiter((v.neighbours[u] for v in self.order for u in sorted(v.neighbours)),
+                                   dtype=float, count=int(self.indptr[-1]))
+        self.indices.flags.writeable = False
+        self.weights.flags.writeable = False
+
+        for v in self.order:
+            v.neighbours = self.indices[self.indptr[v.id]:self.indptr[v.id + 1]]
+
+        self.frozen = True
+
+    def thaw(self) -> None:
+        """
+        Gives every vertex back its own neighbours, so that edges can be added again.
+        """
+        if not self.frozen:
+            return
+
+        for v in self.order:
+            start, end = self.indptr[v.id], self.indptr[v.id + 1]
+            v.neighbours = dict(zip(self.indices[start:end].tolist(), self.weights[start:end].tolist()))
+
+        self.indptr = None
+        self.indices = None
+        self.weights = None
+        self.frozen = False
+
+    def to_networkx(self, maxvertices: int = 5000, order: str = "degree") -> nx.Graph:
+        """
+        Returns a read-only networkx view of at most maxvertices vertices of this graph and the edges between
+        them, with the kind, effective ranges and skill of each vertex and the weight of each edge.
+
+        When the graph has more than maxvertices vertices, the ones kept are those of highest degree
+        (order="degree") or the first ones reached by a breadth-first search from each vertex in turn, in the
+        order they were added (order="bfs"). Ties go to the vertex added first, so the result never depends
+        on the order of a dict or set.
+
+        The graph is built in bulk once and cached, so repeated calls cost nothing until the graph changes.
+
+        Preconditions:
+            - order in {"degree", "bfs"}
+        """
+        key = (maxvertices, order)
+        if key not in self._networkx:
+            self._networkx[key] = self._build_networkx(maxvertices, order)
+
+        return self._networkx[key].copy(as_view=True)
+
+    def _build_networkx(self, maxvertices: int, order: str) -> nx.Graph:
+        """Returns a new networkx graph of the vertices chosen by _select and the edges between them."""
+        chosen = self._select(maxvertices, order)
+        kept = np.zeros(len(self.order), dtype=bool)
+        kept[chosen] = True
+
         graph_nx = nx.Graph()
-        for v in self.vertices.values():
-            graph_nx.add_node(v.item, kind=v.kind, effective_ranges=v.effective_ranges, skill=v.skill)
+        graph_nx.add_nodes_from((self.order[v].item, _node_attributes(self.order[v])) for v in chosen.tolist())
+        graph_nx.add_edges_from((self.order[v].item, self.order[u].item, {"weight": weight})
+                                for v in chosen.tolist() for u, weight in self._pairs(v) if kept[u] and u >= v)
+
+        return graph_nx
+
+    def _select(self, maxvertices: int, order: str) -> np.ndarray:
+        """Returns the ids of the vertices to_networkx keeps, in the order they are kept."""
+        if len(self.order) <= maxvertices:
+            return np.arange(len(self.order))
 
-            for u in v.neighbours:
-                if graph_nx.number_of_nodes() < maxvertices:
-                    graph_nx.add_node(u.item, kind=u.kind, effective_ranges=u.effective_ranges, skill = v.skill)
+        if order == "degree":
+            return np.argsort(-self.degrees(), kind="stable")[:maxvertices]
 
-                if u.item in graph_nx.nodes:
-                    graph_nx.add_edge(v.item, u.item)
+        if order != "bfs":
+            raise ValueError(f"Unknown vertex order {order!r}")
 
-            if graph_nx.number_of_nodes() >= maxvertices:
+        seen = np.zeros(len(self.order), dtype=bool)
+        chosen = []
+
+        for start in range(len(self.order)):
+            if len(chosen) >= maxvertices:
                 break
+            if seen[start]:
+                continue
 
-        return graph_nx
+            seen[start] = True
+            queue = deque([start])
+            while queue and len(chosen) < maxvertices:
+                v = queue.popleft()
+                chosen.append(v)
+
+                for u, _ in self._pairs(v):
+                    if not seen[u]:
+                        seen[u] = True
+                        queue.append(u)
+
+        return np.array(chosen, dtype=np.int64)
+
+
+def _node_attributes(vertex: _Vertex) -> dict[str, Any]:
+    """Returns the attributes to_networkx gives the node of vertex."""
+    return {"kind": vertex.kind, "effective_ranges": vertex.effective_ranges, "skill": vertex.skill}
+
+
+class ItemTable:
+    """
+    The items of one kind (e.g. weapons) read by get_rest, stored column by column instead of one dict per row.
+
+    Every cell is parsed once when the table is built: numeric columns become float arrays (NaN for empty
+    cells), Yes/No columns become boolean flags, the ENUM_COLUMNS become integer codes into a list of interned
+    levels and anything else is kept as interned text. Rows are grouped by category in the order of the
+    database, so the row of the i-th item of a category is start[category] + i.
+
+    A table is built alongside the rows it is read from, not in place of them: main_test keeps those in
+    EQUIPMENT, which every table is rebuilt from after a load and which get_details returns rows of. The table
+    costs about a seventh of the memory of the rows it stores on top of them, in exchange for never parsing a
+    cell again while scoring.
+
+    Instance Attributes:
+        - names: the name of the item in each row
+        - category_names: the categories of the database, in order
+        - categories: the category of each row, as an index into category_names
+        - start: the first row of each category
+        - numeric: the numeric columns
+        - flags: the Yes/No columns
+        - flag_filled: for the Yes/No columns with empty cells, which rows have a Yes or a No
+        - enums: the enum columns, as codes into levels
+        - levels: the distinct values of each enum column
+        - text: the remaining columns
+        - present: for the columns only some rows have, which rows have them
+    """
+    names: list[str]
+    category_names: list[str]
+    categories: np.ndarray
+    start: dict[str, int]
+    numeric: dict[str, np.ndarray]
+    flags: dict[str, np.ndarray]
+    flag_filled: dict[str, np.ndarray]
+    enums: dict[str, np.ndarray]
+    levels: dict[str, list[str]]
+    text: dict[str, list[str]]
+    present: dict[str, np.ndarray]
+
+    def __init__(self, database: dict[str, list[dict[str, str]]]) -> None:
+        rows = []
+        self.start = {}
+        for category, items in database.items():
+            self.start[category] = len(rows)
+            rows.extend(items)
+
+        self.category_names = list(database)
+        self.categories = np.repeat(np.arange(len(database), dtype=np.int32),
+                                    [len(items) for items in database.values()])
+        self.names = [sys.intern(item["Name"]) for item in rows]
+
+        self.numeric, self.flags, self.enums, self.levels, self.text, self.present = {}, {}, {}, {}, {}, {}
+        self.flag_filled = {}
+
+        for column in dict.fromkeys(column for item in rows for column in item):
+            if column == "Name":
+                continue
+
+            present = np.array([column in item for item in rows], dtype=bool)
+            if not present.all():
+                self.present[column] = present
+
+            self._store(column, [item.get(column, "") for item in rows])
+
+    def _store(self, column: str, cells: list[str]) -> None:
+        """Parses the cells of column into the most specific storage that fits all of them."""
+        filled = [cell for cell in cells if cell != ""]
+
+        if column in ENUM_COLUMNS:
+            codes = {}
+            self.enums[column] = np.array([codes.setdefault(sys.intern(cell), len(codes)) for cell in cells],
+                                          dtype=np.int32)
+            self.levels[column] = list(codes)
+
+        elif filled and all(cell.lower() in FLAG_VALUES for cell in filled):
+            self.flags[column] = np.array([FLAG_VALUES.get(cell.lower(), False) for cell in cells], dtype=bool)
+            if len(filled) < len(cells):
+                self.flag_filled[column] = np.array([cell != "" for cell in cells], dtype=bool)
+
+        elif filled and all(_is_number(cell) for cell in filled):
+            self.numeric[column] = np.array([float(cell) if cell != "" else np.nan for cell in cells])
+
+        else:
+            self.text[column] = [sys.intern(cell) for cell in cells]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def category(self, row: int) -> str:
+        """Returns the category of the given row."""
+        return self.category_names[self.categories[row]]
+
+    def has(self, row: int, column: str) -> bool:
+        """Returns whether the item in the given row has the given column at all."""
+        if column in self.present:
+            return bool(self.present[column][row])
+
+        return column in self.numeric or column in self.flags or column in self.enums or column in self.text
+
+    def number(self, row: int, column: str) -> float:
+        """Returns the value of a numeric column in the given row."""
+        return float(self.numeric[column][row])
+
+    def value(self, row: int, column: str) -> Union[float, str]:
+        """Returns the value of any column in the given row, with flags spelled "Yes" or "No", or "" if empty."""
+        if column in self.numeric:
+            return self.number(row, column)
+        elif column in self.flags:
+            if column in self.flag_filled and not self.flag_filled[column][row]:
+                return ""
+            return "Yes" if self.flags[column][row] else "No"
+        elif column in self.enums:
+            return self.levels[column][self.enums[column][row]]
+        else:
+            return self.text[column][row]
+
+    def mask(self, column: str) -> np.ndarray:
+        """Returns which rows have the given column."""
+        if column in self.present:
+            return self.present[column]
+
+        return np.full(len(self), self.has(0, column) if len(self) else False, dtype=bool)
+
+    def column(self, column: str, fill: float = 0.0) -> np.ndarray:
+        """Returns a numeric column with fill in the rows that do not have a value."""
+        if column not in self.numeric:
+            return np.full(len(self), fill)
+
+        return np.where(np.isnan(self.numeric[column]), fill, self.numeric[column])
+
+    def matches(self, column: str, values: list[str]) -> np.ndarray:
+        """Returns which rows have a value of the given column that is one of values."""
+        if column in self.enums:
+            wanted = [code for code, level in enumerate(self.levels[column]) if level in values]
+            result = np.isin(self.enums[column], wanted)
+        elif column in self.flags:
+            result = np.where(self.flags[column], "Yes" in values, "No" in values)
+            if column in self.flag_filled:
+                result &= self.flag_filled[column]
+        elif column in self.text:
+            result = np.isin(np.array(self.text[column], dtype=str), values)
+        elif column in self.numeric:
+            result = np.isin(self.numeric[column], [float(value) for value in values if _is_number(value)])
+        else:
+            result = np.zeros(len(self), dtype=bool)
+
+        return result & self.mask(column)
+
+
+def _is_number(cell: str) -> bool:
+    """Returns whether cell can be read with float()."""
+    try:
+        float(cell)
+    except ValueError:
+        return False
+
+    return True
+
+
+class Session:
+    """
+    A character being scored: everything its scores depend on besides the loaded equipment, which every session
+    shares and only reads through main_test. A session keeps its own copies of what it is given, so sessions can
+    be scored at the same time, e.g. on a thread pool.
+
+    The character is the build taken by main_test.score_builds, so Session(**build) makes a session of a build
+    and build() gives it back.
+
+    Instance Attributes:
+        - special: the character's S.P.E.C.I.A.L., by stat
+        - skills: the value of each of the character's skills
+        - traits: the character's traits
+        - preferences: the character's playstyle preferences: the ranges it prefers, then "Yes" if it wants
+          silent weapons and "No" if it wants loud ones
+    """
+    special: dict[str, int]
+    skills: dict[str, int]
+    traits: list[str]
+    preferences: list[str]
+
+    def __init__(self, special: dict[str, int], skills: dict[str, int], traits: Optional[list[str]] = None,
+                 preferences: Optional[list[str]] = None) -> None:
+        self.special = dict(special)
+        self.skills = dict(skills)
+        self.traits = list(traits) if traits is not None else []
+        self.preferences = list(preferences) if preferences is not None else []
+
+    def build(self) -> dict[str, Any]:
+        """Returns the character as a build, in the form taken by main_test.score_builds."""
+        return {"special": self.special, "skills": self.skills, "traits": self.traits,
+                "preferences": self.preferences}
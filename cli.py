@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tomllib
+from typing import Any, Optional
+
+import numpy as np
+
+import main_test
+import optimizer
+from classes import Session
+from stats import RANGE_OPTIONS, SKILL_STATS, SPECIAL, SPECIAL_POINTS, STAT_RANGE, starting_skills
+
+
+def load_characters(path: str) -> list[dict[str, Any]]:
+    """
+    Reads the character specs in a .json or .toml file. A file holds either one character, or a list of them:
+    a JSON array, or a TOML array of [[character]] tables.
+
+    A character spec looks like:
+        {"name": "Courier", "traits": ["Built to Destroy"],
+         "special": {"STR": 5, "PER": 6, "END": 5, "CHR": 4, "INT": 7, "AGL": 8, "LCK": 5},
+         "tagged": ["Guns", "Sneak", "Repair"],
+         "preferences": {"ranges": ["Mid Range", "Long Range"], "stealth": true, "loud": false}}
+    """
+    if path.lower().endswith(".toml"):
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+        return spec["character"] if "character" in spec else [spec]
+
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    return spec if isinstance(spec, list) else [spec]
+
+
+def character_build(spec: dict[str, Any]) -> dict[str, Any]:
+    """
+    Returns the build described by the character spec, in the form taken by main_test.score_builds.
+
+    Raises a ValueError if spec is not a character the allocators would accept: SPECIAL_POINTS S.P.E.C.I.A.L.
+    points within STAT_RANGE each, exactly three distinct tagged skills, at most two distinct traits, each one
+    the trait allocator offers once the traits are loaded (see optimizer.trait_names), at least one range, all
+    of RANGE_OPTIONS, and stealth, loud or both.
+    """
+    low, high = STAT_RANGE
+    special = {stat: int(spec["special"][stat]) for stat in SPECIAL}
+    if sum(special.values()) != SPECIAL_POINTS or not all(low <= value <= high for value in special.values()):
+        raise ValueError(f"{spec.get('name', 'Character')}: S.P.E.C.I.A.L. must spend {SPECIAL_POINTS} points, "
+                         f"{low} to {high} each")
+
+    skills_by_name = {skill.lower(): skill for skill in SKILL_STATS}
+    tagged = tuple(skills_by_name.get(skill.lower(), skill) for skill in spec["tagged"])
+    if len(set(tagged)) != 3 or not all(skill in SKILL_STATS for skill in tagged):
+        raise ValueError(f"{spec.get('name', 'Character')}: tag exactly three different skills")
+
+    traits = list(spec.get("traits", []))
+    traits += ["No Trait"] * (2 - len(traits))
+    if len(traits) != 2 or (traits[0] == traits[1] and traits[0] != "No Trait"):
+        raise ValueError(f"{spec.get('name', 'Character')}: choose at most two different traits")
+
+    known = optimizer.trait_names()
+    unknown = [trait for trait in traits if trait != "No Trait" and trait not in known]
+    if known and unknown:
+        raise ValueError(f"{spec.get('name', 'Character')}: unknown traits {', '.join(unknown)}")
+
+    preferences = spec.get("preferences", {})
+    ranges = list(preferences.get("ranges", []))
+    if not ranges or not all(option in RANGE_OPTIONS for option in ranges):
+        raise ValueError(f"{spec.get('name', 'Character')}: choose ranges among {', '.join(RANGE_OPTIONS)}")
+    if not preferences.get("stealth") and not preferences.get("loud"):
+        raise ValueError(f"{spec.get('name', 'Character')}: prefer stealth, loud or both")
+
+    return {"special": special,
+            "skills": starting_skills(special, tagged),
+            "traits": traits,
+            "preferences": ranges + ["Yes" if preferences.get("stealth") else "N/A",
+                                     "No" if preferences.get("loud") else "N/A"]}
+
+
+def character_session(spec: dict[str, Any]) -> Session:
+    """
+    Returns a session for the character described by spec, in place of the allocator windows.
+
+    Raises a ValueError if spec is not a valid character (see character_build).
+    """
+    return Session(**character_build(spec))
+
+
+def rank_character(spec: dict[str, Any], k: int = main_test.RANK_LIMIT) -> dict[str, Any]:
+    """
+    Returns the k best weapons of each skill and category and the k best armour of each category, as ranked by
+    main_test.rank_top, for the character described by spec.
+
+    Preconditions:
+        - the equipment has been loaded, e.g. by main_test.load_equipment
+    """
+    return {"name": spec.get("name", ""), **main_test.rank_top(character_session(spec), k)}
+
+
+def score_characters(specs: list[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the score of every weapon and every piece of armour for each of the character specs, as one matrix
+    per kind with a row per character and the columns in the row order of main_test.CATALOGUE.
+
+    Raises a ValueError if any spec is not a valid character (see character_build).
+
+    Preconditions:
+        - the equipment has been loaded, e.g. by main_test.load_equipment
+    """
+    return main_test.score_builds([character_build(spec) for spec in specs])
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Ranks the equipment of every character given on the command line and writes one JSON line per character,
+    in the order given. Characters are ranked at the same time, on a thread pool.
+    """
+    parser = argparse.ArgumentParser(description="Rank Fallout: New Vegas equipment for characters described in "
+                                                 "JSON or TOML files, without the allocator windows.")
+    parser.add_argument("characters", nargs="+", help=".json or .toml files of character specs")
+    parser.add_argument("--top", type=int, default=main_test.RANK_LIMIT,
+                        help="how many items to keep for each skill and category (default: %(default)s)")
+    parser.add_argument("--output", default="", help="file to write the rankings to (default: standard output)")
+    parser.add_argument("--rebuild-cache", action="store_true", help="parse every data file again")
+    args = parser.parse_args(argv)
+
+    main_test.load_equipment(main_test.DATA_DIRECTORIES, rebuild_cache=args.rebuild_cache)
+    main_test.build_catalogue()
+
+    specs = [spec for path in args.characters for spec in load_characters(path)]
+    rankings = main_test.rank_sessions([character_session(spec) for spec in specs], args.top)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for spec, ranking in zip(specs, rankings):
+            print(json.dumps({"name": spec.get("name", ""), **ranking}), file=output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import pprint
+import tkinter as tk
+from tkinter import messagebox
+from typing import Optional
+
+from stats import RANGE_OPTIONS, SPECIAL_POINTS, STAT_RANGE, starting_skills
+
+
+class SpecialAllocator(tk.Tk):
+    special: Optional[dict[str, int]]
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.title("SPECIAL Allocator")
+        self.geometry("200x450")
+
+        self.stats = {stat: tk.IntVar(value=5) for stat in
+                      ["STR", "PER", "END", "CHR", "INT", "AGL", "LCK"]}
+
+        self.total_points = SPECIAL_POINTS
+        self.special = None
+        self.init_ui()
+
+    def init_ui(self) -> None:
+        row = 0
+        for stat, var in self.stats.items():
+            tk.Label(self, text=stat).grid(row=row, column=0, padx=10, pady=10)
+            tk.Button(self, text="-", command=lambda s=stat: self.change_stat(s, -1)).grid(row=row, column=1, padx=5)
+            tk.Entry(self, textvariable=var, state='readonly', width=5).grid(row=row, column=2, padx=5)
+            tk.Button(self, text="+", command=lambda s=stat: self.change_stat(s, 1)).grid(row=row, column=3, padx=5)
+            row += 1
+
+        self.total_label = tk.Label(self, text="Remaining Points: 5")
+        self.total_label.grid(row=row, column=0, columnspan=4, pady=10)
+
+        self.reset_button = tk.Button(self, text="Reset", command=self.reset_stats)
+        self.reset_button.grid(row=row + 1, column=0, columnspan=4, pady=10)
+
+        self.quit_button = tk.Button(self, text="Finish", command=self.end)
+        self.quit_button.grid(row=row + 2, column=0, columnspan=4, pady=10)
+
+    def change_stat(self, stat: str, delta: int) -> None:
+        current_value = self.stats[stat].get()
+        if STAT_RANGE[0] <= current_value + delta <= STAT_RANGE[1]:
+            new_total = self.get_total_points() + delta
+            if new_total <= self.total_points:
+                self.stats[stat].set(current_value + delta)
+                self.update_total_label()
+
+    def get_total_points(self) -> int:
+        return sum(var.get() for var in self.stats.values())
+
+    def update_total_label(self) -> None:
+        remaining_points = self.total_points - self.get_total_points()
+        self.total_label.config(text=f"Remaining Points: {remaining_points}",
+                                fg='red' if remaining_points < 0 else 'black')
+
+    def reset_stats(self) -> None:
+        for var in self.stats.values():
+            var.set(5)
+        self.update_total_label()
+
+    def end(self) -> None:
+        if self.total_points == self.get_total_points():
+            self.destroy()
+            with open("output/PlayerInfo.txt", "a") as log_file:
+                print("S.P.E.C.I.A.L:", file=log_file)
+                pprint.pprint({i: self.stats[i].get() for i in self.stats}, log_file, sort_dicts=False)
+
+            self.special = {i: self.stats[i].get() for i in self.stats}
+
+        else:
+            messagebox.showinfo("Error - Allocate all skills", "You must allocate all points before ending.")
+
+
+class SkillAllocator(tk.Tk):
+    skills: Optional[dict[str, int]]
+
+    def __init__(self, special: dict[str, int]) -> None:
+        super().__init__()
+
+        self.title("Skill Allocator")
+        self.geometry("225x700")
+
+        self.stats = {skill: tk.IntVar(value=value) for skill, value in starting_skills(special).items()}
+
+        self.backup = {key: tk.IntVar(value=var.get()) for key, var in self.stats.items()}
+        self.tagged = set()
+        self.labels = {}
+        self.skills = None
+
+        self.init_ui()
+
+    def init_ui(self) -> None:
+        row = 0
+        for stat, var in self.stats.items():
+            label = tk.Label(self, text=stat)
+            label.grid(row=row, column=0, padx=10, pady=10)
+            self.labels[stat] = label
+
+            tk.Button(self, text="-", command=lambda s=stat: self.change_stat(s, -15)).grid(row=row, column=1, padx=5)
+            tk.Entry(self, textvariable=var, state='readonly', width=5).grid(row=row, column=2, padx=5)
+            tk.Button(self, text="+", command=lambda s=stat: self.change_stat(s, 15)).grid(row=row, column=3, padx=5)
+
+            row += 1
+
+        self.total_label = tk.Label(self, text="Remaining Tags: 3")
+        self.total_label.grid(row=row, column=0, columnspan=4, pady=10)
+
+        self.reset_button = tk.Button(self, text="Reset", command=self.reset_stats)
+        self.reset_button.grid(row=row + 1, column=0, columnspan=4, pady=10)
+
+        self.quit_button = tk.Button(self, text="Finish", command=self.end)
+        self.quit_button.grid(row=row + 2, column=0, columnspan=4, pady=10)
+
+    def change_stat(self, stat: str, delta: int) -> None:
+        if delta > 0 and len(self.tagged) < 3 and stat not in self.tagged:
+            self.stats[stat].set(self.stats[stat].get() + delta)
+            self.tagged.add(stat)
+            self.labels[stat].config(fg="green")
+
+        elif delta < 0 and stat in self.tagged:
+            self.stats[stat].set(self.stats[stat].get() + delta)
+            self.tagged.remove(stat)
+            self.labels[stat].config(fg="black")
+
+        self.update_total_label()
+
+    def update_total_label(self) -> None:
+        remaining_tags = 3 - len(self.tagged)
+        self.total_label.config(text=f"Remaining Tags: {remaining_tags}")
+
+    def reset_stats(self) -> None:
+        for key, var in self.stats.items():
+            var.set(self.backup[key].get())
+            self.labels[key].config(fg="black")
+
+        self.tagged = set()
+        self.update_total_label()
+
+    def end(self) -> None:
+        if len(self.tagged) == 3:
+            self.destroy()
+            self.skills = {key: var.get() for key, var in self.stats.items()}
+
+            with open("output/PlayerInfo.txt", "a") as log_file:
+                print("Tagged Skills:", file=log_file)
+                pprint.pprint(self.tagged, log_file, sort_dicts=False)
+
+                print("\nSkill Points:", file=log_file)
+                for key in self.stats:
+                    print(f'{key}: {self.stats[key].get()}', file=log_file)
+                print("", file=log_file)
+
+                tk.messagebox.showinfo("Preferences Saved", "Your preferences have been saved successfully!")
+        else:
+            messagebox.showinfo("Error - Allocate all tags", "You must tag exactly 3 skills before ending.")
+
+
+class CharacterAllocator(tk.Tk):
+    sex: Optional[str]
+    name_var: tk.StringVar
+    trait1: tk.StringVar
+    trait2: tk.StringVar
+    entry: tk.Entry
+    choose_male_button: tk.Button
+    choose_female_button: tk.Button
+    clicked1: tk.StringVar
+    clicked2: tk.StringVar
+    choose_trait1_button: tk.OptionMenu
+    choose_trait2_button: tk.OptionMenu
+    quit_button: tk.Button
+    traits: dict[str, list[dict[str, str]]]
+    chosen_traits: list[str]
+
+    def __init__(self, traits: dict[str, list[dict[str, str]]]) -> None:
+        super().__init__()
+
+        self.title("Character Allocator")
+        self.geometry("300x300")
+
+        self.sex = None
+        self.name_var = tk.StringVar()
+
+        self.trait1 = tk.StringVar()
+        self.trait2 = tk.StringVar()
+
+        self.trait1.set("No Trait")
+        self.trait2.set("No Trait")
+
+        self.traits = traits
+        self.chosen_traits = []
+
+        self.init_ui()
+
+    def init_ui(self) -> None:
+        # Name selection
+        tk.Label(self, text="Enter your character's name:").pack(pady=10)
+        self.entry = tk.Entry(self, textvariable=self.name_var, width=25)
+        self.entry.pack(pady=5)
+
+        # Sex selection
+        tk.Label(self, text="Choose your sex:").pack(pady=10)
+        button_frame = tk.Frame(self)
+        button_frame.pack()
+        self.choose_male_button = tk.Button(button_frame, text="Male", command=lambda: self.set_sex("Male"))
+        self.choose_male_button.pack(side=tk.LEFT, padx=10)
+        self.choose_female_button = tk.Button(button_frame, text="Female", command=lambda: self.set_sex("Female"))
+        self.choose_female_button.pack(side=tk.LEFT, padx=10)
+
+        # Trait selection
+        tk.Label(self, text="Choose up to two traits:").pack(pady=10)
+        trait_frame = tk.Frame(self)
+        trait_frame.pack()
+
+        hm = [x["Name"] for x in self.traits["Traits - vanilla"]]
+
+        hm += [f"[Old World Blues] {x["Name"]}" for x in self.traits["Traits - old world blues"]]
+
+        self.clicked1 = tk.StringVar()
+        self.clicked1.set("No Trait")
+        self.clicked2 = tk.StringVar()
+        self.clicked2.set("No Trait")
+
+        self.choose_trait1_button = tk.OptionMenu(trait_frame, self.clicked1, *hm, command=self.update_traits)
+        self.choose_trait1_button.pack(side=tk.LEFT, padx=10)
+
+        self.choose_trait2_button = tk.OptionMenu(trait_frame, self.clicked2, *hm, command=self.update_traits)
+        self.choose_trait2_button.pack(side=tk.LEFT, padx=10)
+
+        # Finish button
+        self.quit_button = tk.Button(self, text="Finish", command=self.end)
+        self.quit_button.pack(pady=20)
+
+    def set_sex(self, sex: str) -> None:
+        if sex == "Male":
+            self.choose_male_button.config(fg="Green")
+            self.choose_female_button.config(fg="Black")
+        else:
+            self.choose_female_button.config(fg="Green")
+            self.choose_male_button.config(fg="Black")
+        self.sex = sex
+
+    def update_traits(self, selected_trait: tk.StringVar) -> None:
+        selected_trait1 = self.clicked1.get()
+        selected_trait2 = self.clicked2.get()
+
+        if selected_trait1 == selected_trait2 and selected_trait != "No Trait":
+            messagebox.showinfo("Error", "You cannot select the same trait twice.")
+            self.clicked1.set("No Trait")
+            self.clicked2.set("No Trait")
+
+    def end(self) -> None:
+        name = self.name_var.get().strip()
+        trait1 = self.clicked1.get()
+        trait2 = self.clicked2.get()
+
+        self.chosen_traits = [trait1, trait2]
+
+        if self.sex and name:
+            self.destroy()
+            with open("output/playerinfo.txt", "w") as log_file:
+                print(f"Name: {name}", file=log_file)
+                print(f"Sex: {self.sex}", file=log_file)
+                print(f"Trait 1: {trait1}", file=log_file)
+                print(f"Trait 2: {trait2}\n", file=log_file)
+        else:
+            messagebox.showinfo("Error - Incomplete Information",
+                                "You must choose your sex, enter a name, and select traits before ending.")
+
+
+class DisplayTraits(tk.Toplevel):
+    traits: list[str]
+
+    def __init__(self, parent: CharacterAllocator) -> None:
+        super().__init__(parent)
+
+        self.title("Trait Information")
+
+        w = 800  # width for the Tk root
+        h = 650  # height for the Tk root
+
+        # get screen width and height
+        ws = self.winfo_screenwidth()  # width of the screen
+        hs = self.winfo_screenheight()  # height of the screen
+
+        # calculate x and y coordinates for the Tk root window
+        x = (ws / 2) - (w / 2)
+        y = (hs / 2) - (h / 2)
+
+        # set the dimensions of the screen
+        # and where it is placed
+        self.geometry('%dx%d+%d+%d' % (w, h, x, y))
+
+        self.traits = [f"{string['Name']}:\n\t- {string['Benefit']}\n\t- However, {string['Penalty']}" for string in
+                       parent.traits["Traits - vanilla"]]
+
+        self.traits += [f"[Old World Blues] {trait['Name']}:\n\t- {trait['Benefit']}\n\t- However, {trait['Penalty']}"
+                        for trait in parent.traits["Traits - old world blues"]]
+
+        self.init_ui()
+
+    def init_ui(self) -> None:
+        t = tk.Text(self)
+
+        t.configure(font=("Times New Roman", 12), wrap="word")
+
+        for trait in self.traits:
+            t.insert(tk.END, trait + "\n\n")
+
+        t.pack(expand=True, fill=tk.BOTH)  # Make the text box fill the entire window
+
+
+class PreferenceAllocator(tk.Tk):
+    options_range: list[str]
+    options_stealth: list[str]
+    selected_range: list[str]
+    selected_stealth: list[str]
+    preferences: list[str]
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.title("Preference Allocator")
+        self.geometry("300x400")
+
+        self.options_range = list(RANGE_OPTIONS)
+        self.options_stealth = ["Stealth", "Loud"]
+
+        self.selected_range = []
+        self.selected_stealth = []
+        self.preferences = []
+
+        self.init_ui()
+
+    def init_ui(self) -> None:
+        tk.Label(self, text="Select your preferred ranges:").grid(row=0, column=0, padx=10, pady=10)
+
+        for i, option in enumerate(self.options_range):
+            chk = tk.Checkbutton(self, text=option, command=lambda o=option: self.toggle_option(o, 'range'))
+            chk.grid(row=i + 1, column=0, sticky='w', padx=10, pady=5)
+
+        tk.Label(self, text="Select your preferred combat methods:").grid(row=len(self.options_range) + 1, column=0,
+                                                                          padx=10, pady=10)
+
+        for i, option in enumerate(self.options_stealth):
+            chk = tk.Checkbutton(self, text=option, command=lambda o=option: self.toggle_option(o, 'stealth'))
+            chk.grid(row=len(self.options_range) + 2 + i, column=0, sticky='w', padx=10, pady=5)
+
+        self.submit_button = tk.Button(self, text="Submit", command=self.submit_preferences)
+        self.submit_button.grid(row=len(self.options_range) + len(self.options_stealth) + 3, column=0, pady=20)
+
+    def toggle_option(self, option: str, category: str) -> None:
+        if category == 'range':
+            if option in self.selected_range:
+                self.selected_range.remove(option)
+            else:
+                self.selected_range.append(option)
+        elif category == 'stealth':
+            if option in self.selected_stealth:
+                self.selected_stealth.remove(option)
+            else:
+                self.selected_stealth.append(option)
+
+    def submit_preferences(self) -> None:
+        if self.selected_stealth and self.selected_range:
+            self.preferences = self.selected_range + ["Yes" if "Stealth" in self.selected_stealth else "N/A",
+                                                      "No" if "Loud" in self.selected_stealth else "N/A"]
+            print(self.preferences)
+
+            self.destroy()
+        else:
+            tk.messagebox.showinfo("Error", "You must check at least one item from each category.")
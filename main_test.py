@@ -1,24 +1,41 @@
 # program setup
 from __future__ import annotations
 
-import math
+import atexit
+import csv
+import fnmatch
+import hashlib
+import json
+import multiprocessing
 import os
+import pickle
 import pprint
-import tkinter as tk
-from tkinter import messagebox
-from typing import Any, Optional, TextIO
-
-from classes import Graph
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Iterator, Optional, TextIO
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from classes import Graph, ItemTable, Session
+from stats import derive_stats
 from vis import visualize_graph
 
-# variables to be used later
+# the loaded data, shared by every Session, which only reads it; characters live in their own Session
 EQUIPMENT = {}
-TRAITS = {}
-SKILLS = {}
-CHOSEN_TRAITS = []
-PLAYSTYLE_PREFERENCES = []
-SPECIALDICT = {}
-
+ITEM_INDEX = {}
+CATALOGUE = {}
+CATALOGUE_LOCK = threading.RLock()  # held while build_catalogue swaps in the shared data, and to read it whole
+BOUNDS = {}  # the (column, low, high) each kind of CATALOGUE is normalized against; see data_bounds
+FEATURES = {}  # the normalized stats of each kind of CATALOGUE, one row per item; see build_catalogue
+WEAPON_FRONTS = {}  # the Pareto front of each weapon skill, by the directions it was computed for
+CATALOGUE_VERSION = ""  # a hash of EQUIPMENT as of the last build_catalogue
+
+# the stats each score normalizes, with the bounds used when the data itself gives none (see data_bounds)
 NORMALIZATION_DATA_WEPS = [
     ["Damage per shot", 1, 1075],
     ["Damage per second", 1.3, 390],
@@ -41,605 +58,1190 @@ WEIGHT_WEPS = [0.3, 0.2, 0.1, 0.1, 0.1, 0.1, -0.001, -0.01, -0.001]
 
 WEIGHT_CLOTH = [3, 1, -1]
 
-
-def get_rest(directory: str) -> dict[Any, list]:
+# where get_rest keeps the parsed contents of each data directory between runs
+CACHE_DIRECTORY = "cache"
+CACHE_VERSION = 2  # bump whenever parse_rest changes what it returns
+
+# where get_rest dumps the equipment it read when asked to, and the thread that writes it
+EQUIPMENT_INFO_FILE = "output/equipmentInfo.jsonl"
+EQUIPMENT_INFO_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="equipment-info")
+DUMPED_DIRECTORIES = set()
+DUMP_LOCK = threading.Lock()
+
+# the optional file in a data directory that assigns its files to categories, and the separator that otherwise
+# lets a file add to the category of another, as in "Guns - vanilla + My Mod.csv"
+CATEGORY_MANIFEST = "categories.json"
+CATEGORY_SEPARATOR = " + "
+
+# the data directories main loads, in the order they are merged into EQUIPMENT
+DATA_DIRECTORIES = ["weapons", "perks", "traits", "companions", "armour"]
+
+# leftovers from bad encoding, removed from every cell read by parse_rest
+CELL_CLEANUP = str.maketrans({'\xa0': ' ', '*': None})
+
+# how many items rank_top keeps for each skill and each category, and how far below the character's best weapon
+# skill a weapon skill can be for its weapons to be ranked, and how many sessions rank_sessions ranks together
+RANK_LIMIT = 10
+SKILL_MARGIN = 10
+RANK_BATCH = 256
+
+# where cached_scores keeps the scores of builds between runs and how many, how many it also keeps in memory,
+# both sized to the batches of builds rank_sessions is meant for, how many it writes at once and how many keys it
+# looks up in one query; below SCORE_STORE_ITEMS items, scoring a build again is cheaper than reading its scores
+SCORE_CACHE_FILE = os.path.join(CACHE_DIRECTORY, "scores.sqlite")
+SCORE_STORE_SIZE = 10000
+SCORE_CACHE_SIZE = 10000
+SCORE_WRITE_BATCH = 256
+SCORE_QUERY_SIZE = 500
+SCORE_STORE_ITEMS = 1000
+SCORE_VERSION = 1  # bump whenever the same build and data would get different scores
+SCORE_STORE_LAYOUT = 1  # bump whenever the table of SCORE_CACHE_FILE changes
+SCORE_MEMORY = OrderedDict()
+SCORE_WRITES = {}  # what flush_scores has yet to do: the scores to store, or None for those only read, by key
+SCORE_LOCK = threading.Lock()
+SCORE_STORES = threading.local()  # the connection of each thread to SCORE_CACHE_FILE; see _score_store
+
+
+def get_rest(directory: str, use_cache: bool = True, rebuild_cache: bool = False,
+             dump_info: bool = False, parser: Optional[Executor] = None) -> dict[Any, list]:
     """
     Reads the weapon information from the files in the provided directory and stores them in a dictionary.
 
+    Parsed files are kept in a binary cache under CACHE_DIRECTORY, keyed by their path, size and modification
+    time, so only the files that changed since the last run are parsed again. use_cache=False neither reads
+    nor writes the cache, and rebuild_cache=True parses every file again and replaces it.
+
+    With dump_info=True the items read are also written to EQUIPMENT_INFO_FILE in the background.
+    Given a parser pool, the files that need parsing are parsed on it at the same time.
+
+    Files are assigned to categories by resolve_categories, and files it cannot assign are skipped with
+    a warning.
+
     Preconditions:
         - directory contains only valid .csv files
     """
 
     # extract each file in the local data directory
-    files = os.listdir(directory)
-    files = [x for x in files if ".csv" in x]
-    database = {key[:-4].capitalize(): [] for key in files}
+    files = sorted(os.listdir(directory))
+    files = [x for x in files if x.lower().endswith(".csv")]
 
     # we begin to categorize our data
-    for file in files:
-        file_name = file[:-4].lower()
+    database, unassigned, ambiguous = resolve_categories(directory, files)
 
-        for category in database:
-            if category.lower() in file_name:
-                database[category].append(file)
+    if unassigned:
+        warnings.warn(f"{directory}: no category for {', '.join(unassigned)}")
+    if ambiguous:
+        warnings.warn(f"{directory}: more than one category for {', '.join(ambiguous)}")
 
-    # we call parse_rest to parse through the whole spreadsheet
-    for category, files in database.items():
-        items = []
+    # we call parse_rest to parse through the whole spreadsheet, unless the cache has an up-to-date copy
+    cache = read_cache(directory) if use_cache and not rebuild_cache else {}
+    parsed = {}
 
-        for file in files:
-            with open(os.path.join(directory, file), 'r', encoding="ISO-8859-1") as f:
-                items.extend(parse_rest(f))
+    for path in dict.fromkeys(os.path.join(directory, file) for files in database.values() for file in files):
+        stat = os.stat(path)
+        entry = cache.get(path)
 
-        database[category] = items
+        if entry is None or entry[:2] != (stat.st_size, stat.st_mtime_ns):
+            rows = parser.submit(parse_file, path) if parser else parse_file(path)
+            entry = (stat.st_size, stat.st_mtime_ns, rows)
+
+        parsed[path] = entry
+
+    for path, (size, mtime, rows) in parsed.items():
+        if isinstance(rows, Future):
+            parsed[path] = (size, mtime, rows.result())
+
+    for category, files in database.items():
+        database[category] = [item for file in files for item in parsed[os.path.join(directory, file)][2]]
+
+    if use_cache and parsed != cache:
+        write_cache(directory, parsed)
 
     # adds an extra "No Trait" option
     if "traits" in directory.lower():
-        global TRAITS
-        TRAITS = database
-        TRAITS["Traits - vanilla"].insert(0, {
+        database["Traits - vanilla"].insert(0, {
             'Name': 'No Trait',
             'Benefit': "No downsides...",
             'Penalty': "You are officially boring."
         })
 
-    # we print out our equipment information
-    with open("output/equipmentInfo.txt", "a") as log_file:
-        for category, items in database.items():
-            print(category, file=log_file)
-            for item in items:
-                pprint.pprint(item, stream=log_file, sort_dicts=False)
-                print("", file=log_file)
-            print("---------------", file=log_file)
+    # we print out our equipment information if asked to
+    if dump_info:
+        dump_equipment_info(directory, database)
 
     # return the equipment database
     return database
 
 
-def parse_rest(file: TextIO) -> list[dict[str, str]]:
-    """
-    Parses through a .csv file and standardizes its format into a categorized list of dictionaries.
+def resolve_categories(directory: str, files: list[str]) -> tuple[dict[str, list[str]], list[str], list[str]]:
     """
-    # var setup
-    attributes = file.readline().strip().split(",")
-    res = []
+    Assigns each of the .csv files of directory to a category in a single pass, and returns the files of
+    each category along with the files that could not be assigned and the files that matched more than one
+    category.
 
-    # for each row -
-    for row in file:
+    If directory has a CATEGORY_MANIFEST, it maps each category name to a list of file names or glob patterns,
+    and only the files it matches are loaded. Otherwise every file is its own category, named after the file,
+    except that a file named "<category><CATEGORY_SEPARATOR><anything>.csv" is added to <category>.
 
-        row_list = row.split(",")
+    >>> resolve_categories("nowhere", ["Guns - vanilla.csv", "Guns - vanilla + Mod.csv", "Guns - dlc.csv"])
+    ({'Guns - vanilla': ['Guns - vanilla.csv', 'Guns - vanilla + Mod.csv'], 'Guns - dlc': ['Guns - dlc.csv']}, [], [])
+    """
+    database, unassigned, ambiguous = {}, [], []
+    manifest_path = os.path.join(directory, CATEGORY_MANIFEST)
 
-        # - we remove leftovers from bad encoding and standardize the format
-        for index in range(len(row_list)):
-            row_list[index] = row_list[index].replace(u'\xa0', u' ')
-            row_list[index] = row_list[index].replace('*', '')
-            row_list[index] = row_list[index].replace('/comma', ',')
+    if not os.path.exists(manifest_path):
+        for file in files:
+            category = file[:-4].split(CATEGORY_SEPARATOR, 1)[0].strip().capitalize()
+            database.setdefault(category, []).append(file)
 
-        res.append({attributes[i].strip(): row_list[i].strip() for i in range(len(attributes))})
+        return database, unassigned, ambiguous
 
-    # returning the list
-    return res
+    with open(manifest_path, 'r', encoding="utf-8") as f:
+        manifest = json.load(f)
 
+    # exact file names are looked up directly, only real patterns are matched one by one
+    exact, patterns = {}, []
+    for category, entries in manifest.items():
+        database[category] = []
+        for entry in entries:
+            if any(char in entry for char in "*?["):
+                patterns.append((entry.lower(), category))
+            else:
+                exact.setdefault(entry.lower(), []).append(category)
 
-class SpecialAllocator(tk.Tk):
-    def __init__(self) -> None:
-        super().__init__()
+    for file in files:
+        matches = exact.get(file.lower(), []) + [category for pattern, category in patterns
+                                                  if fnmatch.fnmatchcase(file.lower(), pattern)]
+        matches = list(dict.fromkeys(matches))
+
+        if not matches:
+            unassigned.append(file)
+        elif len(matches) > 1:
+            ambiguous.append(file)
+        else:
+            database[matches[0]].append(file)
 
-        self.title("SPECIAL Allocator")
-        self.geometry("200x450")
+    return database, unassigned, ambiguous
 
-        self.stats = {stat: tk.IntVar(value=5) for stat in
-                      ["STR", "PER", "END", "CHR", "INT", "AGL", "LCK"]}
 
-        self.total_points = 40
-        self.init_ui()
+def load_equipment(names: list[str], processes: bool = True, workers: Optional[int] = None, **options: Any) -> None:
+    """
+    Loads data/<name> into EQUIPMENT[name] for every name, reading all the directories and parsing all their
+    files at the same time. options are passed on to get_rest.
 
-    def init_ui(self) -> None:
-        row = 0
-        for stat, var in self.stats.items():
-            tk.Label(self, text=stat).grid(row=row, column=0, padx=10, pady=10)
-            tk.Button(self, text="-", command=lambda s=stat: self.change_stat(s, -1)).grid(row=row, column=1, padx=5)
-            tk.Entry(self, textvariable=var, state='readonly', width=5).grid(row=row, column=2, padx=5)
-            tk.Button(self, text="+", command=lambda s=stat: self.change_stat(s, 1)).grid(row=row, column=3, padx=5)
-            row += 1
+    Files are parsed on a pool of processes, or of threads if processes is False, with workers workers (one
+    per core by default). EQUIPMENT is always filled in the order of names, and each directory in the sorted
+    order of its files, whichever finishes first.
 
-        self.total_label = tk.Label(self, text="Remaining Points: 5")
-        self.total_label.grid(row=row, column=0, columnspan=4, pady=10)
+    The processes are started with spawn rather than fork, since the loader threads submit to the pool while
+    other threads are running.
 
-        self.reset_button = tk.Button(self, text="Reset", command=self.reset_stats)
-        self.reset_button.grid(row=row + 1, column=0, columnspan=4, pady=10)
+    The new equipment is swapped in under CATALOGUE_LOCK, and the catalogue built from the old one is cleared
+    at the same time (see clear_catalogue), so it is built again from the new equipment when next needed.
+    """
+    if processes:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
 
-        self.quit_button = tk.Button(self, text="Finish", command=self.end)
-        self.quit_button.grid(row=row + 2, column=0, columnspan=4, pady=10)
+    with pool as parser, ThreadPoolExecutor(max_workers=max(len(names), 1)) as loader:
+        loading = [loader.submit(get_rest, f"data/{name}", parser=parser, **options) for name in names]
+        loaded = [database.result() for database in loading]
 
-    def change_stat(self, stat: str, delta: int) -> None:
-        current_value = self.stats[stat].get()
-        if 1 <= current_value + delta <= 10:
-            new_total = self.get_total_points() + delta
-            if new_total <= self.total_points:
-                self.stats[stat].set(current_value + delta)
-                self.update_total_label()
+    with CATALOGUE_LOCK:
+        EQUIPMENT.update(zip(names, loaded))
+        clear_catalogue()
 
-    def get_total_points(self) -> int:
-        return sum(var.get() for var in self.stats.values())
 
-    def update_total_label(self) -> None:
-        remaining_points = self.total_points - self.get_total_points()
-        self.total_label.config(text=f"Remaining Points: {remaining_points}",
-                                fg='red' if remaining_points < 0 else 'black')
+def clear_catalogue() -> None:
+    """
+    Forgets ITEM_INDEX, CATALOGUE and everything built with them, so that build_catalogue builds them again from
+    EQUIPMENT when they are next needed. Call it whenever EQUIPMENT changes.
+    """
+    global ITEM_INDEX, CATALOGUE, BOUNDS, FEATURES, WEAPON_FRONTS
 
-    def reset_stats(self) -> None:
-        for var in self.stats.values():
-            var.set(5)
-        self.update_total_label()
+    with CATALOGUE_LOCK:
+        ITEM_INDEX, CATALOGUE, BOUNDS, FEATURES, WEAPON_FRONTS = {}, {}, {}, {}, {}
 
-    def end(self) -> None:
-        if self.total_points == self.get_total_points():
-            self.destroy()
-            with open("output/PlayerInfo.txt", "a") as log_file:
-                print("S.P.E.C.I.A.L:", file=log_file)
-                pprint.pprint({i: self.stats[i].get() for i in self.stats}, log_file, sort_dicts=False)
 
-            global SPECIALDICT
-            SPECIALDICT = {i: self.stats[i].get() for i in self.stats}
+def cache_path(directory: str) -> str:
+    """
+    Returns the file in CACHE_DIRECTORY that holds the parsed contents of directory.
 
-        else:
-            messagebox.showinfo("Error - Allocate all skills", "You must allocate all points before ending.")
-
-
-class SkillAllocator(tk.Tk):
-    def __init__(self) -> None:
-        super().__init__()
-
-        self.title("Skill Allocator")
-        self.geometry("225x700")
-
-        self.stats = {
-            "Barter": tk.IntVar(value=2 + (2 * SPECIALDICT["CHR"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Energy weapons": tk.IntVar(value=2 + (2 * SPECIALDICT["PER"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Explosives": tk.IntVar(value=2 + (2 * SPECIALDICT["PER"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Guns": tk.IntVar(value=2 + (2 * SPECIALDICT["AGL"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Lockpick": tk.IntVar(value=2 + (2 * SPECIALDICT["PER"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Medicine": tk.IntVar(value=2 + (2 * SPECIALDICT["INT"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Melee weapons": tk.IntVar(value=2 + (2 * SPECIALDICT["STR"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Repair": tk.IntVar(value=2 + (2 * SPECIALDICT["INT"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Science": tk.IntVar(value=2 + (2 * SPECIALDICT["INT"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Sneak": tk.IntVar(value=2 + (2 * SPECIALDICT["AGL"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Speech": tk.IntVar(value=2 + (2 * SPECIALDICT["CHR"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Survival": tk.IntVar(value=2 + (2 * SPECIALDICT["END"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-            "Unarmed": tk.IntVar(value=2 + (2 * SPECIALDICT["END"]) + math.ceil(SPECIALDICT["LCK"] / 2)),
-        }
-
-        self.backup = {key: tk.IntVar(value=var.get()) for key, var in self.stats.items()}
-        self.tagged = set()
-        self.labels = {}
-
-        self.init_ui()
-
-    def init_ui(self) -> None:
-        row = 0
-        for stat, var in self.stats.items():
-            label = tk.Label(self, text=stat)
-            label.grid(row=row, column=0, padx=10, pady=10)
-            self.labels[stat] = label
-
-            tk.Button(self, text="-", command=lambda s=stat: self.change_stat(s, -15)).grid(row=row, column=1, padx=5)
-            tk.Entry(self, textvariable=var, state='readonly', width=5).grid(row=row, column=2, padx=5)
-            tk.Button(self, text="+", command=lambda s=stat: self.change_stat(s, 15)).grid(row=row, column=3, padx=5)
-
-            row += 1
-
-        self.total_label = tk.Label(self, text="Remaining Tags: 3")
-        self.total_label.grid(row=row, column=0, columnspan=4, pady=10)
-
-        self.reset_button = tk.Button(self, text="Reset", command=self.reset_stats)
-        self.reset_button.grid(row=row + 1, column=0, columnspan=4, pady=10)
-
-        self.quit_button = tk.Button(self, text="Finish", command=self.end)
-        self.quit_button.grid(row=row + 2, column=0, columnspan=4, pady=10)
-
-    def change_stat(self, stat: str, delta: int) -> None:
-        if delta > 0 and len(self.tagged) < 3 and stat not in self.tagged:
-            self.stats[stat].set(self.stats[stat].get() + delta)
-            self.tagged.add(stat)
-            self.labels[stat].config(fg="green")
-
-        elif delta < 0 and stat in self.tagged:
-            self.stats[stat].set(self.stats[stat].get() + delta)
-            self.tagged.remove(stat)
-            self.labels[stat].config(fg="black")
-
-        self.update_total_label()
-
-    def update_total_label(self) -> None:
-        remaining_tags = 3 - len(self.tagged)
-        self.total_label.config(text=f"Remaining Tags: {remaining_tags}")
-
-    def reset_stats(self) -> None:
-        for key, var in self.stats.items():
-            var.set(self.backup[key].get())
-            self.labels[key].config(fg="black")
-
-        self.tagged = set()
-        self.update_total_label()
-
-    def end(self) -> None:
-        if len(self.tagged) == 3:
-            self.destroy()
-            global SKILLS
-            SKILLS = self.stats
-
-            with open("output/PlayerInfo.txt", "a") as log_file:
-                print("Tagged Skills:", file=log_file)
-                pprint.pprint(self.tagged, log_file, sort_dicts=False)
-
-                print("\nSkill Points:", file=log_file)
-                for key in self.stats:
-                    print(f'{key}: {self.stats[key].get()}', file=log_file)
-                print("", file=log_file)
-
-                tk.messagebox.showinfo("Preferences Saved", "Your preferences have been saved successfully!")
-        else:
-            messagebox.showinfo("Error - Allocate all tags", "You must tag exactly 3 skills before ending.")
-
-
-class CharacterAllocator(tk.Tk):
-    sex: Optional[str]
-    name_var: tk.StringVar
-    trait1: tk.StringVar
-    trait2: tk.StringVar
-    entry: tk.Entry
-    choose_male_button: tk.Button
-    choose_female_button: tk.Button
-    clicked1: tk.StringVar
-    clicked2: tk.StringVar
-    choose_trait1_button: tk.OptionMenu
-    choose_trait2_button: tk.OptionMenu
-    quit_button: tk.Button
-    traits: list[str]
-
-    def __init__(self) -> None:
-        super().__init__()
-
-        self.title("Character Allocator")
-        self.geometry("300x300")
-
-        self.sex = None
-        self.name_var = tk.StringVar()
-
-        self.trait1 = tk.StringVar()
-        self.trait2 = tk.StringVar()
-
-        self.trait1.set("No Trait")
-        self.trait2.set("No Trait")
-
-        self.init_ui()
-
-    def init_ui(self) -> None:
-        # Name selection
-        tk.Label(self, text="Enter your character's name:").pack(pady=10)
-        self.entry = tk.Entry(self, textvariable=self.name_var, width=25)
-        self.entry.pack(pady=5)
-
-        # Sex selection
-        tk.Label(self, text="Choose your sex:").pack(pady=10)
-        button_frame = tk.Frame(self)
-        button_frame.pack()
-        self.choose_male_button = tk.Button(button_frame, text="Male", command=lambda: self.set_sex("Male"))
-        self.choose_male_button.pack(side=tk.LEFT, padx=10)
-        self.choose_female_button = tk.Button(button_frame, text="Female", command=lambda: self.set_sex("Female"))
-        self.choose_female_button.pack(side=tk.LEFT, padx=10)
-
-        # Trait selection
-        tk.Label(self, text="Choose up to two traits:").pack(pady=10)
-        trait_frame = tk.Frame(self)
-        trait_frame.pack()
-
-        hm = [x["Name"] for x in TRAITS["Traits - vanilla"]]
-
-        hm += [f"[Old World Blues] {x["Name"]}" for x in TRAITS["Traits - old world blues"]]
-
-        self.clicked1 = tk.StringVar()
-        self.clicked1.set("No Trait")
-        self.clicked2 = tk.StringVar()
-        self.clicked2.set("No Trait")
-
-        self.choose_trait1_button = tk.OptionMenu(trait_frame, self.clicked1, *hm, command=self.update_traits)
-        self.choose_trait1_button.pack(side=tk.LEFT, padx=10)
-
-        self.choose_trait2_button = tk.OptionMenu(trait_frame, self.clicked2, *hm, command=self.update_traits)
-        self.choose_trait2_button.pack(side=tk.LEFT, padx=10)
-
-        # Finish button
-        self.quit_button = tk.Button(self, text="Finish", command=self.end)
-        self.quit_button.pack(pady=20)
-
-    def set_sex(self, sex: str) -> None:
-        if sex == "Male":
-            self.choose_male_button.config(fg="Green")
-            self.choose_female_button.config(fg="Black")
-        else:
-            self.choose_female_button.config(fg="Green")
-            self.choose_male_button.config(fg="Black")
-        self.sex = sex
-
-    def update_traits(self, selected_trait: tk.StringVar) -> None:
-        selected_trait1 = self.clicked1.get()
-        selected_trait2 = self.clicked2.get()
-
-        if selected_trait1 == selected_trait2 and selected_trait != "No Trait":
-            messagebox.showinfo("Error", "You cannot select the same trait twice.")
-            self.clicked1.set("No Trait")
-            self.clicked2.set("No Trait")
-
-    def end(self) -> None:
-        name = self.name_var.get().strip()
-        trait1 = self.clicked1.get()
-        trait2 = self.clicked2.get()
-
-        global CHOSEN_TRAITS
-        CHOSEN_TRAITS = [trait1, trait2]
-
-        if self.sex and name:
-            self.destroy()
-            with open("output/playerinfo.txt", "w") as log_file:
-                print(f"Name: {name}", file=log_file)
-                print(f"Sex: {self.sex}", file=log_file)
-                print(f"Trait 1: {trait1}", file=log_file)
-                print(f"Trait 2: {trait2}\n", file=log_file)
-        else:
-            messagebox.showinfo("Error - Incomplete Information",
-                                "You must choose your sex, enter a name, and select traits before ending.")
+    >>> cache_path("data/weapons").replace(os.sep, "/")
+    'cache/data_weapons.v2.pickle'
+    """
+    name = os.path.normpath(directory).replace(os.sep, "_").strip("_.")
+    return os.path.join(CACHE_DIRECTORY, f"{name}.v{CACHE_VERSION}.pickle")
 
 
-class DisplayTraits(tk.Toplevel):
-    traits: list[str]
+def read_cache(directory: str) -> dict[str, tuple[int, int, list[dict[str, str]]]]:
+    """
+    Returns the cached parse of each file of directory, as (size, modification time, rows) keyed by file path.
+    A missing, unreadable or corrupt cache is treated as empty.
+    """
+    try:
+        with open(cache_path(directory), "rb") as f:
+            cache = pickle.load(f)
+    except Exception:  # a truncated or foreign pickle can fail in almost any way
+        return {}
 
-    def __init__(self, parent: CharacterAllocator) -> None:
-        super().__init__(parent)
+    return cache if isinstance(cache, dict) else {}
 
-        self.title("Trait Information")
 
-        w = 800  # width for the Tk root
-        h = 650  # height for the Tk root
+def write_cache(directory: str, parsed: dict[str, tuple[int, int, list[dict[str, str]]]]) -> None:
+    """
+    Replaces the cache of directory with parsed, in the format read by read_cache.
+    """
+    path = cache_path(directory)
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
 
-        # get screen width and height
-        ws = self.winfo_screenwidth()  # width of the screen
-        hs = self.winfo_screenheight()  # height of the screen
+    # written under a unique name first, since other runs or threads may be writing the same cache
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
 
-        # calculate x and y coordinates for the Tk root window
-        x = (ws / 2) - (w / 2)
-        y = (hs / 2) - (h / 2)
 
-        # set the dimensions of the screen
-        # and where it is placed
-        self.geometry('%dx%d+%d+%d' % (w, h, x, y))
+def dump_equipment_info(directory: str, database: dict[Any, list]) -> Optional[Future]:
+    """
+    Queues database to be written to EQUIPMENT_INFO_FILE as one JSON object per item, and returns the pending
+    write, or None if directory was already dumped during this run.
 
-        global TRAITS
+    The file is started afresh by the first dump of each run, so it no longer grows across runs, and the
+    writing happens on EQUIPMENT_INFO_WRITER so that loading never waits for it.
+    """
+    # snapshot the lists, since get_rest's callers may add to them while the file is being written
+    snapshot = {category: list(items) for category, items in database.items()}
 
-        self.traits = [f"{string['Name']}:\n\t- {string['Benefit']}\n\t- However, {string['Penalty']}" for string in
-                       TRAITS["Traits - vanilla"]]
+    with DUMP_LOCK:
+        if directory in DUMPED_DIRECTORIES:
+            return None
 
-        self.traits += [f"[Old World Blues] {trait['Name']}:\n\t- {trait['Benefit']}\n\t- However, {trait['Penalty']}"
-                        for trait in TRAITS["Traits - old world blues"]]
+        mode = "a" if DUMPED_DIRECTORIES else "w"
+        DUMPED_DIRECTORIES.add(directory)
 
-        self.init_ui()
+        return EQUIPMENT_INFO_WRITER.submit(write_equipment_info, directory, snapshot, mode)
 
-    def init_ui(self) -> None:
-        t = tk.Text(self)
 
-        t.configure(font=("Times New Roman", 12), wrap="word")
+def write_equipment_info(directory: str, database: dict[Any, list], mode: str) -> None:
+    """
+    Writes database to EQUIPMENT_INFO_FILE as JSON lines, with the given file mode.
+    """
+    os.makedirs(os.path.dirname(EQUIPMENT_INFO_FILE), exist_ok=True)
 
-        for trait in self.traits:
-            t.insert(tk.END, trait + "\n\n")
+    with open(EQUIPMENT_INFO_FILE, mode, encoding="utf-8", buffering=1 << 16) as log_file:
+        log_file.writelines(json.dumps({"directory": directory, "category": category, "item": item}) + "\n"
+                            for category, items in database.items() for item in items)
 
-        t.pack(expand=True, fill=tk.BOTH)  # Make the text box fill the entire window
 
+def parse_file(path: str) -> list[dict[str, str]]:
+    """
+    Returns every row of the .csv file at path, as read by parse_rest.
+    """
+    with open(path, 'r', encoding="ISO-8859-1", newline='') as f:
+        return list(parse_rest(f))
 
-class PreferenceAllocator(tk.Tk):
-    options_range: list[str]
-    options_stealth: list[str]
-    selected_range: list[str]
-    selected_stealth: list[str]
 
-    def __init__(self) -> None:
-        super().__init__()
+def parse_rest(file: TextIO) -> Iterator[dict[str, str]]:
+    """
+    Parses through a .csv file and yields its rows one at a time, each standardized into a dictionary keyed by
+    the header of the file.
 
-        self.title("Preference Allocator")
-        self.geometry("300x400")
+    Fields may be quoted to contain commas; the older "/comma" escape is still understood. Rows shorter than
+    the header are padded with empty strings, and cells beyond the header are ignored.
 
-        self.options_range = ["Close Range", "Mid Range", "Long Range", "Traps"]
-        self.options_stealth = ["Stealth", "Loud"]
+    >>> import io
+    >>> list(parse_rest(io.StringIO('Name,Range\\n"Bozar*",Long Range/commaMid Range\\nShort\\n')))
+    [{'Name': 'Bozar', 'Range': 'Long Range,Mid Range'}, {'Name': 'Short', 'Range': ''}]
+    """
+    reader = csv.reader(file)
+    attributes = [attribute.strip() for attribute in next(reader, [])]
+    width = len(attributes)
 
-        self.selected_range = []
-        self.selected_stealth = []
+    for row in reader:
+        if not row:
+            continue
 
-        self.init_ui()
+        # we remove leftovers from bad encoding and standardize the format
+        cells = []
+        for cell in row[:width]:
+            cell = cell.translate(CELL_CLEANUP)
+            if "/comma" in cell:
+                cell = cell.replace('/comma', ',')
+            cells.append(cell.strip())
 
-    def init_ui(self) -> None:
-        tk.Label(self, text="Select your preferred ranges:").grid(row=0, column=0, padx=10, pady=10)
+        cells.extend([""] * (width - len(cells)))
+        yield dict(zip(attributes, cells))
 
-        for i, option in enumerate(self.options_range):
-            chk = tk.Checkbutton(self, text=option, command=lambda o=option: self.toggle_option(o, 'range'))
-            chk.grid(row=i + 1, column=0, sticky='w', padx=10, pady=5)
 
-        tk.Label(self, text="Select your preferred combat methods:").grid(row=len(self.options_range) + 1, column=0,
-                                                                          padx=10, pady=10)
+def main() -> Session:
+    # Load the weapons and every other equipment category at once
+    load_equipment(DATA_DIRECTORIES)
 
-        for i, option in enumerate(self.options_stealth):
-            chk = tk.Checkbutton(self, text=option, command=lambda o=option: self.toggle_option(o, 'stealth'))
-            chk.grid(row=len(self.options_range) + 2 + i, column=0, sticky='w', padx=10, pady=5)
+    # Index every category by item name and store the scored kinds as typed tables
+    build_catalogue()
 
-        self.submit_button = tk.Button(self, text="Submit", command=self.submit_preferences)
-        self.submit_button.grid(row=len(self.options_range) + len(self.options_stealth) + 3, column=0, pady=20)
+    # Link every weapon to its most similar alternatives
+    tree = build_similarity_graph()
 
-    def toggle_option(self, option: str, category: str) -> None:
-        if category == 'range':
-            if option in self.selected_range:
-                self.selected_range.remove(option)
-            else:
-                self.selected_range.append(option)
-        elif category == 'stealth':
-            if option in self.selected_stealth:
-                self.selected_stealth.remove(option)
-            else:
-                self.selected_stealth.append(option)
+    # Visualize the constructed graph
+    visualize_graph(tree)
 
-    def submit_preferences(self) -> None:
-        if self.selected_stealth and self.selected_range:
-            global PLAYSTYLE_PREFERENCES
-            PLAYSTYLE_PREFERENCES = self.selected_range + ["Yes" if "Stealth" in self.selected_stealth else "N/A",
-                                                           "No" if "Loud" in self.selected_stealth else "N/A"]
-            print(PLAYSTYLE_PREFERENCES)
+    # the allocator windows are only needed here, so scoring never has to import tkinter
+    from gui import CharacterAllocator, DisplayTraits, PreferenceAllocator, SkillAllocator, SpecialAllocator
 
-            self.destroy()
-        else:
-            tk.messagebox.showinfo("Error", "You must check at least one item from each category.")
+    preferences = PreferenceAllocator()
+    preferences.mainloop()
 
+    character_allocator = CharacterAllocator(EQUIPMENT["traits"])
+    DisplayTraits(character_allocator)
 
-def main() -> None:
-    # Load weapons data
-    EQUIPMENT["weapons"] = get_rest("data/weapons")
+    character_allocator.mainloop()
 
-    # List of other equipment categories to load
-    files = ["perks", "traits", "companions", "armour"]
+    app3 = SpecialAllocator()
+    app3.mainloop()
 
-    # Load data for each category
-    for item in files:
-        EQUIPMENT[item] = get_rest(f"data/{item}")
+    app4 = SkillAllocator(app3.special)
+    app4.mainloop()
 
-    # Initialize the first weapon by skill type
-    first = {item.split(" -")[0].capitalize(): "NULL" for item in EQUIPMENT["weapons"]}
+    # the character chosen in the allocator windows
+    return Session(special=app3.special, skills=app4.skills, traits=character_allocator.chosen_traits,
+                   preferences=preferences.preferences)
 
-    # Reference list for range categories
-    # range_ref = ["Close range", "Mid range", "Long range", "Placed"]
 
-    # Initialize the graph
-    tree = Graph()
+def normalize_name(name: str) -> str:
+    """
+    Returns the form of an item name used as a key in ITEM_INDEX.
 
-    # Process each weapon
-    for key in EQUIPMENT["weapons"]:
+    >>> normalize_name("  Sonic   Emitter ")
+    'sonic emitter'
+    """
+    return " ".join(name.split()).lower()
 
-        for i in EQUIPMENT["weapons"][key]:
 
-            skill = key.split(" -")[0].capitalize()
-            # fire_mode = i["Tags"].strip().split(",")
-            #
-            # # Check which range categories are present
-            # test = [k in fire_mode for k in range_ref]
+def build_item_index(key: str) -> None:
+    """
+    Builds the name index of EQUIPMENT[key] so that finding an item is a dictionary lookup instead of a linear scan.
+    load_equipment drops the index along with the catalogue (see clear_catalogue), and find_item rebuilds it when
+    it is missing.
+
+    The index maps names to positions within their category. Every item can be found by its name in any case,
+    and by its name prefixed with the DLC of its category, e.g. "[Old World Blues] Sonic Emitter" for an item of
+    "Energy weapons - old world blues". When two items share a name, the first one read wins, like the scan
+    it replaces.
+    """
+    ITEM_INDEX[key] = _item_index(key)
 
-            # Create a list of applicable ranges
-            # curr = [range_ref[index] for index in range(len(test)) if test[index]]
 
-            # Add vertex to the graph
-            tree.add_vertex(item=i["Name"], kind=key, skill=skill, ranges=[])
-            tree.vertices[i["Name"]].effective_ranges = i["Range"].split("/comma")
+def _item_index(key: str) -> dict[str, dict[str, int]]:
+    """
+    Returns the name index of EQUIPMENT[key] that build_item_index stores.
+    """
+    index = {}
 
-            # Establish the first weapon of each skill type
-            if first[skill] == "NULL":
-                first[skill] = i["Name"]
+    for item_type, items in EQUIPMENT[key].items():
+        aliases = {}
+        dlc = item_type.split(" - ", 1)[1] if " - " in item_type else ""
 
-            # Add edge between the current weapon and the first weapon of its skill type
-            tree.add_edge(i["Name"], first[skill])
+        for position, item in enumerate(items):
+            aliases.setdefault(normalize_name(item["Name"]), position)
 
-    # Visualize the constructed graph
-    visualize_graph(tree)
+            if dlc:
+                aliases.setdefault(normalize_name(f"[{dlc}] {item['Name']}"), position)
 
-    preferences = PreferenceAllocator()
-    preferences.mainloop()
+        index[item_type] = aliases
 
-    character_allocator = CharacterAllocator()
-    DisplayTraits(character_allocator)
+    return index
 
-    character_allocator.mainloop()
 
-    app3 = SpecialAllocator()
-    app3.mainloop()
+def find_item(name: str, item_type: str, key: str) -> int:
+    """
+    Returns the position of the item called name in EQUIPMENT[key][item_type].
 
-    app4 = SkillAllocator()
-    app4.mainloop()
+    Raises a ValueError if there is no such item.
+    """
+    if key not in ITEM_INDEX:
+        build_item_index(key)
+
+    try:
+        return ITEM_INDEX[key][item_type][normalize_name(name)]
+    except KeyError:
+        raise ValueError(f"No item named {name!r} in {key} category {item_type!r}") from None
 
 
 def get_details(name: str, item_type: str, key: str) -> dict[str, str]:
-    """Fetch and return the details of a specific weapon."""
-    for item in EQUIPMENT[key][item_type]:
-        if item["Name"] == name:
-            return item
+    """
+    Fetch and return the details of a specific item.
 
-    return {"Error": "Weapon not found"}
+    Raises a ValueError if EQUIPMENT[key][item_type] has no item called name.
+    """
+    return EQUIPMENT[key][item_type][find_item(name, item_type, key)]
 
 
-def get_wep_score(name: str, wep_type: str) -> float:
-    sum_so_far = 0.0
-    weapon = get_details(name, wep_type, "weapons")
+def build_catalogue() -> None:
+    """
+    Indexes every loaded kind of EQUIPMENT by name, and stores the weapons, armour and companions as typed
+    tables in CATALOGUE so that scoring never has to parse the strings read by get_rest again.
+
+    The stats of the weapons and armour are normalized against the bounds of the loaded data once here, and
+    kept read-only in FEATURES for every score computed until the next load. The row dicts of EQUIPMENT are
+    kept as they are, since the tables are rebuilt from them (see ItemTable).
+
+    CATALOGUE_VERSION is set from the contents of EQUIPMENT, however it was filled, so that cached_scores never
+    returns the scores of other data; the scores stored for any other data are dropped.
+
+    Everything is built anew and swapped in at once under CATALOGUE_LOCK, so whoever reads a table and its
+    features under the lock (see catalogue_view) gets both from the same build.
+    """
+    with CATALOGUE_LOCK:
+        _build_catalogue()
+
+
+def _build_catalogue() -> None:
+    """
+    Does the work of build_catalogue, while it holds CATALOGUE_LOCK.
+    """
+    global ITEM_INDEX, CATALOGUE, BOUNDS, FEATURES, WEAPON_FRONTS, CATALOGUE_VERSION
+    flush_scores()
+
+    index = {key: _item_index(key) for key in EQUIPMENT}
+    catalogue = {key: ItemTable(EQUIPMENT[key]) for key in ("weapons", "armour", "companions") if key in EQUIPMENT}
+    bounds, features = {}, {}
+
+    for key, normalization in (("weapons", NORMALIZATION_DATA_WEPS), ("armour", NORMALIZATION_DATA_CLOTH)):
+        if key in catalogue:
+            table = catalogue[key]
+            bounds[key] = data_bounds(table, normalization)
+
+            # weapons without a stat get nothing for it, while armour is scored as if it had 0
+            if key == "weapons":
+                columns = [np.where(table.mask(column), (table.column(column) - low) / (high - low), 0.0)
+                           for column, low, high in bounds[key]]
+            else:
+                columns = [(table.column(column) - low) / (high - low) for column, low, high in bounds[key]]
+
+            features[key] = np.column_stack(columns).reshape(len(table), len(normalization))
+            features[key].setflags(write=False)
 
-    skill_factor = SKILLS[wep_type.split(" -")[0]].get() / 100
+    version = hashlib.sha256(json.dumps(EQUIPMENT).encode()).hexdigest()
+    ITEM_INDEX, CATALOGUE, BOUNDS, FEATURES, WEAPON_FRONTS, CATALOGUE_VERSION = \
+        index, catalogue, bounds, features, {}, version
 
-    for index in range(len(NORMALIZATION_DATA_WEPS)):
-        curr = NORMALIZATION_DATA_WEPS[index]
-        if curr[0] in weapon and "AOE" not in weapon:
+    purge_scores()
+    with SCORE_LOCK:
+        SCORE_MEMORY.clear()
 
-            sum_so_far += WEIGHT_WEPS[index] * skill_factor * (float(weapon[curr[0]]) - curr[1]) / (curr[2] - curr[1])
 
-        elif curr[0] in weapon and "AOE" in weapon:
+def catalogue_view(kind: str) -> tuple[ItemTable, np.ndarray]:
+    """
+    Returns CATALOGUE[kind] and FEATURES[kind], "weapons" or "armour", from the same build_catalogue, building
+    the catalogue first if it has not been.
+    """
+    with CATALOGUE_LOCK:
+        if kind not in FEATURES:
+            build_catalogue()
 
-            sum_so_far += (0.3 * WEIGHT_WEPS[index] * skill_factor * (float(weapon[curr[0]]) - curr[1]) /
-                           (curr[2] - curr[1]))
+        return CATALOGUE[kind], FEATURES[kind]
+
+
+def share_catalogue(catalogue: dict[str, ItemTable], features: dict[str, np.ndarray],
+                    bounds: dict[str, list[tuple[str, float, float]]]) -> None:
+    """
+    Gives a worker process the CATALOGUE, FEATURES and BOUNDS of the process that started it, so that it can
+    score without loading anything. Every process pool that scores uses it as its initializer, with those three
+    as its initargs.
+    """
+    CATALOGUE.update(catalogue)
+    FEATURES.update(features)
+    BOUNDS.update(bounds)
 
-    global CHOSEN_TRAITS
-    action_points = 65 + 3 * SPECIALDICT["AGL"]
-    crit_chance = (SPECIALDICT["LCK"] + 3 * ("Built to Destroy" in CHOSEN_TRAITS)) / 100
+
+def data_bounds(table: ItemTable, normalization: list[list]) -> list[tuple[str, float, float]]:
+    """
+    Returns the lowest and highest value in table of each column of normalization, as (column, low, high).
+    The bounds in normalization are kept for a column with no values or only one.
+    """
+    bounds = []
+    for column, low, high in normalization:
+        values = table.column(column, np.nan)
+        values = values[table.mask(column) & ~np.isnan(values)]
+
+        if len(values) and values.max() > values.min():
+            low, high = float(values.min()), float(values.max())
+        bounds.append((column, low, high))
+
+    return bounds
+
+
+def get_row(name: str, item_type: str, key: str, table: Optional[ItemTable] = None) -> int:
+    """
+    Returns the row of table, CATALOGUE[key] by default, holding the item called name of the given category.
+
+    Raises a ValueError if there is no such item.
+    """
+    if table is None:
+        if key not in CATALOGUE:
+            build_catalogue()
+        table = CATALOGUE[key]
+
+    return table.start[item_type] + find_item(name, item_type, key)
+
+
+def get_wep_score(session: Session, name: str, wep_type: str) -> float:
+    sum_so_far = 0.0
+    weapons, features = catalogue_view("weapons")
+    row = get_row(name, wep_type, "weapons", weapons)
+
+    skill_factor = session.skills[wep_type.split(" -")[0]] / 100
+
+    # the weighted stats of this weapon alone, which area of effect weapons only get 0.3 of
+    sum_so_far += (0.3 if weapons.has(row, "AOE") else 1.0) * skill_factor * weighted_stats(
+        "weapons", features=features[row:row + 1])[0]
+
+    derived = derive_stats(session.special, traits=session.traits)
+    action_points = derived.action_points
+    crit_chance = derived.crit_chance
 
     if "Melee" in wep_type:
-        str_factor = SPECIALDICT["STR"]
+        str_factor = session.special["STR"]
     else:
-        str_factor = SPECIALDICT["PER"]
+        str_factor = session.special["PER"]
 
-    if weapon["Range"] not in PLAYSTYLE_PREFERENCES:
-        if "Weapon spread" in weapon:
-            sum_so_far -= int(weapon["Weapon spread"]) + 0.5
+    if weapons.value(row, "Range") not in session.preferences:
+        if weapons.has(row, "Weapon spread"):
+            sum_so_far -= weapons.number(row, "Weapon spread") + 0.5
         else:
             sum_so_far /= 2
 
-    if weapon["Silent"] in PLAYSTYLE_PREFERENCES:
+    if weapons.value(row, "Silent") in session.preferences:
         sum_so_far += 1
 
     else:
         sum_so_far /= 3
 
-    sum_so_far += ((str_factor * skill_factor) + (0.01 * (action_points / int(weapon["Action point cost"]))
-                                                  * float(weapon["Damage per Action Point"])))
+    sum_so_far += ((str_factor * skill_factor) + (0.01 * (action_points / weapons.number(row, "Action point cost"))
+                                                  * weapons.number(row, "Damage per Action Point")))
 
-    if "Critical hit Damage" in weapon:
-        sum_so_far += 0.05 * crit_chance * float(weapon["Critical chance multiplier"]) * int(
-            weapon["Critical hit Damage"]) * (skill_factor / 10)
+    if weapons.has(row, "Critical hit Damage"):
+        sum_so_far += 0.05 * crit_chance * weapons.number(row, "Critical chance multiplier") * weapons.number(
+            row, "Critical hit Damage") * (skill_factor / 10)
 
-    if "Weapon Spread" in weapon:
-        sum_so_far -= 0.05 * float(weapon["Weapon Spread"]) / skill_factor
+    if weapons.has(row, "Weapon Spread"):
+        sum_so_far -= 0.05 * weapons.number(row, "Weapon Spread") / skill_factor
 
     return round(sum_so_far, 2)
 
 
-def get_cloth_score(name: str, cloth_type: str) -> float:
+def weapon_features() -> np.ndarray:
+    """
+    Returns the stats of NORMALIZATION_DATA_WEPS for every weapon in CATALOGUE["weapons"], normalized against
+    BOUNDS["weapons"], with one row per weapon and zero where a weapon does not have a stat. The matrix is
+    cached and read-only.
+    """
+    return catalogue_view("weapons")[1]
+
+
+def armour_features() -> np.ndarray:
+    """
+    Returns the stats of NORMALIZATION_DATA_CLOTH for every piece of armour in CATALOGUE["armour"], normalized
+    against BOUNDS["armour"], with one row per piece. The matrix is cached and read-only.
+    """
+    return catalogue_view("armour")[1]
+
+
+def weighted_stats(kind: str, weights: Optional[list[float]] = None,
+                   features: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Returns the normalized stats of every item of kind, "weapons" or "armour", weighted by weights (WEIGHT_WEPS
+    or WEIGHT_CLOTH by default) and summed: the part of each score that does not depend on the character.
+
+    This is a single product of the cached features, or of features if given, with weights, so trying other
+    weights re-ranks the whole catalogue at once.
+    """
+    if features is None:
+        features = weapon_features() if kind == "weapons" else armour_features()
+    if weights is None:
+        weights = WEIGHT_WEPS if kind == "weapons" else WEIGHT_CLOTH
+
+    return features @ np.asarray(weights, dtype=float)
+
+
+def pareto_front(points: np.ndarray) -> np.ndarray:
+    """
+    Returns the rows of points that no other row dominates, in increasing order. A row dominates another when
+    it is at least as large in every column and larger in at least one.
+
+    Rows are swept from the largest sum of their columns down, so a row can only be dominated by rows already
+    on the front and is only compared with those, rather than with every other row.
+
+    >>> pareto_front(np.array([[1, 2], [2, 1], [0, 0], [1, 1]])).tolist()
+    [0, 1]
+    """
+    front = []
+    for row in np.argsort(-points.sum(axis=1), kind="stable"):
+        kept = points[front]
+        if not np.any(np.all(kept >= points[row], axis=1) & np.any(kept > points[row], axis=1)):
+            front.append(row)
+
+    return np.sort(np.array(front, dtype=int))
+
+
+def weapon_fronts() -> dict[str, np.ndarray]:
+    """
+    Returns the rows of CATALOGUE["weapons"] on the Pareto front of each weapon skill, over the stats of
+    NORMALIZATION_DATA_WEPS, where a stat is better the larger it is if its WEIGHT_WEPS is positive and the
+    smaller it is if negative.
+
+    Fronts are only computed once for each catalogue and each choice of those directions.
+    """
+    directions = tuple(-1 if weight < 0 else 1 for weight in WEIGHT_WEPS)
+
+    with CATALOGUE_LOCK:
+        weapons, features = catalogue_view("weapons")
+
+        if directions not in WEAPON_FRONTS:
+            features = features * np.array(directions)
+            skills = np.array([category.split(" -")[0] for category in weapons.category_names])[weapons.categories]
+
+            WEAPON_FRONTS[directions] = {}
+            for skill in dict.fromkeys(skills.tolist()):
+                rows = np.flatnonzero(skills == skill)
+                WEAPON_FRONTS[directions][skill] = rows[pareto_front(features[rows])]
+
+        return WEAPON_FRONTS[directions]
+
+
+def best_weapons(weights: Optional[list[float]] = None) -> dict[str, tuple[str, float]]:
+    """
+    Returns the name and weighted stats of the weapon of each skill whose stats of NORMALIZATION_DATA_WEPS,
+    normalized, have the largest sum weighted by weights (WEIGHT_WEPS by default). Only the weapons on the
+    fronts of weapon_fronts are scanned, which always hold the best weapon for weights of the same signs.
+
+    Raises a ValueError if a weight has the opposite sign to the one in WEIGHT_WEPS.
+    """
+    weights = np.array(WEIGHT_WEPS if weights is None else weights, dtype=float)
+    if np.any(weights * np.array(WEIGHT_WEPS) < 0):
+        raise ValueError("Each weight must have the same sign as in WEIGHT_WEPS, or be zero")
+
+    with CATALOGUE_LOCK:
+        weapons, features = catalogue_view("weapons")
+        fronts = weapon_fronts()
+
+    best = {}
+    for skill, rows in fronts.items():
+        scores = features[rows] @ weights
+        row = rows[np.argmax(scores)]
+        best[skill] = (weapons.names[row], float(scores.max()))
+
+    return best
+
+
+def build_similarity_graph(k: int = 5, by_skill: bool = True) -> Graph:
+    """
+    Returns a frozen graph of every weapon in CATALOGUE["weapons"], where each weapon is linked to the k weapons
+    whose normalized stats are closest to its own, with weight 1 / (1 + distance). With by_skill, weapons are
+    only linked to other weapons of the same skill, so the neighbours of a weapon are its alternatives.
+
+    Neighbours come from a k-d tree query, so the graph is built in O(n log n) rather than by comparing every
+    pair of weapons.
+    """
+    weapons, features = catalogue_view("weapons")
+    skills = [category.split(" -")[0].capitalize() for category in weapons.category_names]
+    skill_of_row = np.array([skills.index(skill) for skill in skills], dtype=int)[weapons.categories]
+
+    tree = Graph()
+
+    for row, name in enumerate(weapons.names):
+        tree.add_vertex(item=name, kind=weapons.category(row), skill=skills[weapons.categories[row]],
+                        ranges=[part.strip() for part in weapons.value(row, "Range").split(",")])
+
+    groups = [np.flatnonzero(skill_of_row == skill) for skill in np.unique(skill_of_row)] if by_skill \
+        else [np.arange(len(weapons))]
+
+    for rows in groups:
+        if len(rows) < 2:
+            continue
+
+        distances, neighbours = cKDTree(features[rows]).query(features[rows], k=min(k + 1, len(rows)))
+
+        for row, row_distances, row_neighbours in zip(rows, distances, neighbours):
+            # the nearest point is normally the weapon itself, but not when two weapons have identical stats
+            linked = [(distance, rows[neighbour]) for distance, neighbour in zip(row_distances, row_neighbours)
+                      if rows[neighbour] != row][:k]
+
+            for distance, neighbour in linked:
+                tree.add_edge(weapons.names[row], weapons.names[neighbour], 1 / (1 + distance))
+
+    tree.freeze()
+
+    return tree
+
+
+def score_weapons(session: Session) -> np.ndarray:
+    """
+    Returns the get_wep_score of every weapon in CATALOGUE["weapons"] for the character of session, in row
+    order, computed with a few array operations over the whole catalogue instead of one call per weapon. Only
+    the weapons need to be loaded.
+    """
+    return score_weapon_builds([session.build()])[0]
+
+
+def score_builds(builds: list[dict[str, Any]], chunk: int = 4096, weapon_weights: Optional[list[float]] = None,
+                 armour_weights: Optional[list[float]] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the scores of every weapon and of every piece of armour in CATALOGUE for each of builds, as one
+    matrix with a row per build for each kind, with the columns in catalogue row order.
+
+    A build holds what get_wep_score and get_cloth_score read from their Session: its "special", "skills",
+    "traits" and "preferences" (see Session.build). Everything that only depends on the items is
+    computed once for all builds, and builds are scored chunk at a time to bound memory. weapon_weights and
+    armour_weights stand in for WEIGHT_WEPS and WEIGHT_CLOTH.
+    """
+    return score_weapon_builds(builds, chunk, weapon_weights), score_armour_builds(builds, chunk, armour_weights)
+
+
+def cached_scores(build: dict[str, Any], weapon_weights: Optional[list[float]] = None,
+                  armour_weights: Optional[list[float]] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the scores of score_builds for build alone, as a read-only row of weapon scores and one of armour
+    scores, reusing the scores of the same build, weights and data from this run or an earlier one.
+
+    Scores are looked up by score_key, first among the SCORE_CACHE_SIZE most recently used in memory, then in
+    SCORE_CACHE_FILE. The scores computed and the ones read are stored, or marked as used, SCORE_WRITE_BATCH
+    at a time by flush_scores. SCORE_CACHE_FILE is left alone while CATALOGUE has fewer than SCORE_STORE_ITEMS
+    items, since scoring them is then cheaper than a lookup.
+    """
+    return cached_scores_batch([build], weapon_weights, armour_weights)[0]
+
+
+def cached_scores_batch(builds: list[dict[str, Any]], weapon_weights: Optional[list[float]] = None,
+                        armour_weights: Optional[list[float]] = None) -> list[tuple[np.ndarray, np.ndarray]]:
+    """
+    Returns the cached_scores of each of builds, in order.
+
+    The builds missing from memory are looked up in SCORE_CACHE_FILE together, and the ones missing from both
+    are scored with a single call to score_builds, so a batch costs about what scoring its new builds at once
+    does.
+    """
+    if "weapons" not in CATALOGUE or "armour" not in CATALOGUE:
+        build_catalogue()
+
+    keys = [score_key(build, weapon_weights, armour_weights) for build in builds]
+    found = {}
+
+    with SCORE_LOCK:
+        for key in keys:
+            if key in SCORE_MEMORY:
+                SCORE_MEMORY.move_to_end(key)
+                found[key] = SCORE_MEMORY[key]
+
+    stored = {}
+    store = len(CATALOGUE["weapons"]) + len(CATALOGUE["armour"]) >= SCORE_STORE_ITEMS
+    if store:
+        stored = read_scores([key for key in dict.fromkeys(keys) if key not in found])
+    missing = {key: build for key, build in zip(keys, builds) if key not in found and key not in stored}
+    scored = {}
+
+    if missing:
+        weapons, armour = score_builds(list(missing.values()), weapon_weights=weapon_weights,
+                                       armour_weights=armour_weights)
+        scored = {key: (weapons[row], armour[row]) for row, key in enumerate(missing)}
+
+    for scores in [*stored.values(), *scored.values()]:
+        for row in scores:
+            row.setflags(write=False)
+
+    with SCORE_LOCK:
+        for key, scores in stored.items():
+            SCORE_MEMORY[key] = scores
+            SCORE_WRITES[key] = None
+        for key, scores in scored.items():
+            SCORE_MEMORY[key] = scores
+            if store:
+                SCORE_WRITES[key] = scores
+
+        while len(SCORE_MEMORY) > SCORE_CACHE_SIZE:
+            SCORE_MEMORY.popitem(last=False)
+        full = len(SCORE_WRITES) >= SCORE_WRITE_BATCH
+
+    if full:
+        flush_scores()
+
+    found.update(stored)
+    found.update(scored)
+    return [found[key] for key in keys]
+
+
+def score_key(build: dict[str, Any], weapon_weights: Optional[list[float]] = None,
+              armour_weights: Optional[list[float]] = None) -> str:
+    """
+    Returns a hash of everything the scores of build depend on: SCORE_VERSION, CATALOGUE_VERSION, the build
+    and the weights, WEIGHT_WEPS and WEIGHT_CLOTH unless given.
+    """
+    key = [SCORE_VERSION, CATALOGUE_VERSION,
+           {stat: int(value) for stat, value in build["special"].items()},
+           {skill: int(value) for skill, value in build["skills"].items()},
+           sorted(build["traits"]), sorted(build["preferences"]),
+           [float(weight) for weight in (WEIGHT_WEPS if weapon_weights is None else weapon_weights)],
+           [float(weight) for weight in (WEIGHT_CLOTH if armour_weights is None else armour_weights)]]
+
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def read_scores(keys: list[str]) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Returns the weapon and armour scores stored in SCORE_CACHE_FILE under each of keys that has them, looked up
+    SCORE_QUERY_SIZE keys per query. Scores without a score for every row of CATALOGUE are left out, and a
+    missing or unreadable store is treated as empty.
+    """
+    sizes = [len(CATALOGUE[kind]) * np.dtype(float).itemsize for kind in ("weapons", "armour")]
+    found = {}
+
+    try:
+        db = _score_store()
+        for start in range(0, len(keys), SCORE_QUERY_SIZE):
+            part = keys[start:start + SCORE_QUERY_SIZE]
+            rows = db.execute(f"SELECT key, weapons, armour FROM scores WHERE key IN ({', '.join('?' * len(part))})",
+                              part).fetchall()
+            found.update((key, (np.frombuffer(weapons), np.frombuffer(armour))) for key, weapons, armour in rows
+                         if [len(weapons), len(armour)] == sizes)
+    except sqlite3.Error:
+        return {}
+
+    return found
+
+
+@atexit.register
+def flush_scores() -> None:
+    """
+    Stores the scores cached_scores has computed since the last flush in SCORE_CACHE_FILE and marks the ones
+    it has read as used, all in one transaction, then drops the least recently used scores beyond
+    SCORE_STORE_SIZE. It also runs when the program ends. Failing to write only loses the cached copies, so it
+    warns instead of raising.
+    """
+    with SCORE_LOCK:
+        writes = dict(SCORE_WRITES)
+        SCORE_WRITES.clear()
+
+    if not writes:
+        return
+
+    version = f"{SCORE_VERSION}:{CATALOGUE_VERSION}"
+    now = time.time_ns()
+
+    try:
+        with _score_store() as db:
+            db.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                           [(key, version, now, np.ascontiguousarray(scores[0], dtype=float).tobytes(),
+                             np.ascontiguousarray(scores[1], dtype=float).tobytes())
+                            for key, scores in writes.items() if scores is not None])
+            db.executemany("UPDATE scores SET last_used = ? WHERE key = ?",
+                           [(now, key) for key, scores in writes.items() if scores is None])
+            db.execute("DELETE FROM scores WHERE key IN "
+                       "(SELECT key FROM scores ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (SCORE_STORE_SIZE,))
+    except sqlite3.Error as error:
+        warnings.warn(f"could not cache scores in {SCORE_CACHE_FILE}: {error}")
+
+
+def purge_scores() -> None:
+    """
+    Drops the scores stored in SCORE_CACHE_FILE for any other SCORE_VERSION or CATALOGUE_VERSION.
+    """
+    try:
+        with _score_store() as db:
+            db.execute("DELETE FROM scores WHERE version != ?", (f"{SCORE_VERSION}:{CATALOGUE_VERSION}",))
+    except sqlite3.Error as error:
+        warnings.warn(f"could not purge the scores in {SCORE_CACHE_FILE}: {error}")
+
+
+def _score_store() -> sqlite3.Connection:
+    """
+    Returns the connection of the calling thread to SCORE_CACHE_FILE. It is opened the first time a thread
+    asks, or SCORE_CACHE_FILE has changed since, which is also when its table is created, or replaced if it
+    has another SCORE_STORE_LAYOUT.
+    """
+    if getattr(SCORE_STORES, "path", None) == SCORE_CACHE_FILE:
+        return SCORE_STORES.connection
+    if getattr(SCORE_STORES, "path", None) is not None:
+        SCORE_STORES.connection.close()
+        SCORE_STORES.path = None
+
+    os.makedirs(os.path.dirname(SCORE_CACHE_FILE) or ".", exist_ok=True)
+    db = sqlite3.connect(SCORE_CACHE_FILE)
+
+    try:
+        if db.execute("PRAGMA user_version").fetchone()[0] != SCORE_STORE_LAYOUT:
+            db.executescript("DROP TABLE IF EXISTS scores;"
+                             "CREATE TABLE scores (key TEXT PRIMARY KEY, version TEXT, last_used INTEGER, "
+                             "weapons BLOB, armour BLOB);"
+                             "CREATE INDEX scores_last_used ON scores (last_used);"
+                             f"PRAGMA user_version = {SCORE_STORE_LAYOUT};")
+    except sqlite3.Error:
+        db.close()
+        raise
+
+    SCORE_STORES.connection, SCORE_STORES.path = db, SCORE_CACHE_FILE
+    return db
+
+
+def score_weapon_builds(builds: list[dict[str, Any]], chunk: int = 4096,
+                        weights: Optional[list[float]] = None) -> np.ndarray:
+    """
+    Returns the get_wep_score of every weapon in CATALOGUE["weapons"] for each of builds, with a row per build,
+    with weights in place of WEIGHT_WEPS if given: either one list of weights for every build, or an array with
+    a row of weights per build.
+    """
+    weapons, features = catalogue_view("weapons")
+
+    # everything about the weapons themselves, shared by every build
+    skills = [category.split(" -")[0] for category in weapons.category_names]
+    melee = np.array(["Melee" in category for category in weapons.category_names])[weapons.categories]
+    base = np.where(weapons.mask("AOE"), 0.3, 1.0)
+    weighted = weighted_stats("weapons", None if weights is None else np.transpose(weights), features).T
+    has_spread = weapons.mask("Weapon spread")
+    spread = weapons.column("Weapon spread") + 0.5
+    ap_cost = weapons.column("Action point cost", np.nan)
+    damage_per_ap = weapons.column("Damage per Action Point")
+    has_crit = weapons.mask("Critical hit Damage")
+    crit_multiplier = weapons.column("Critical chance multiplier")
+    crit_damage = weapons.column("Critical hit Damage")
+    has_wide_spread = weapons.mask("Weapon Spread")
+    wide_spread = 0.05 * weapons.column("Weapon Spread")
+
+    result = np.empty((len(builds), len(weapons)))
+
+    for start in range(0, len(builds), chunk):
+        part = builds[start:start + chunk]
+        special = {stat: np.array([build["special"][stat] for build in part])[:, None] for stat in ("STR", "PER")}
+        derived = [derive_stats(build["special"], traits=build["traits"]) for build in part]
+
+        skill_factor = (np.array([[build["skills"][skill] for skill in skills] for build in part]).reshape(
+            len(part), len(skills)) / 100)[:, weapons.categories]
+        action_points = np.array([stats.action_points for stats in derived])[:, None]
+        crit_chance = np.array([stats.crit_chance for stats in derived])[:, None]
+        str_factor = np.where(melee, special["STR"], special["PER"])
+
+        scores = base * skill_factor * (weighted[start:start + chunk] if weighted.ndim > 1 else weighted)
+
+        # range and stealth preferences
+        preferences = [build["preferences"] for build in part]
+        off_range = ~preference_matches(weapons, "Range", preferences)
+        scores = np.where(off_range & has_spread, scores - spread, np.where(off_range, scores / 2, scores))
+        scores = np.where(preference_matches(weapons, "Silent", preferences), scores + 1, scores / 3)
+
+        scores += (str_factor * skill_factor + 0.01 * (action_points / ap_cost) * damage_per_ap)
+
+        # critical hits and spread, only for the weapons that list them
+        scores += np.where(has_crit, 0.05 * crit_chance * crit_multiplier * crit_damage * (skill_factor / 10), 0.0)
+        scores -= np.where(has_wide_spread, wide_spread / skill_factor, 0.0)
+
+        result[start:start + chunk] = np.round(scores, 2)
+
+    return result
+
+
+def score_armour_builds(builds: list[dict[str, Any]], chunk: int = 4096,
+                        weights: Optional[list[float]] = None) -> np.ndarray:
+    """
+    Returns the get_cloth_score of every piece of armour in CATALOGUE["armour"] for each of builds, with a row
+    per build, with weights in place of WEIGHT_CLOTH if given, as in score_weapon_builds.
+    """
+    armour, features = catalogue_view("armour")
+
+    # everything about the armour itself, shared by every build
+    protection, burden = armour_terms(weights, features)
+    weight = armour.column("Weight")
+    stealthy = np.array(["stealth" in name.lower() for name in armour.names], dtype=bool)
+
+    result = np.empty((len(builds), len(armour)))
+
+    for start in range(0, len(builds), chunk):
+        part = builds[start:start + chunk]
+        carry_weight = np.array([derive_stats(build["special"]).carry_weight for build in part])[:, None]
+        stealth = np.array([["Yes" in build["preferences"]] for build in part]).reshape(len(part), 1)
+
+        if protection.ndim > 1:
+            scores = protection[start:start + chunk] + np.where(carry_weight / 8 <= weight,
+                                                                burden[start:start + chunk], 0.0)
+        else:
+            scores = protection + np.where(carry_weight / 8 <= weight, burden, 0.0)
+        scores = np.where(stealth & stealthy, scores + 3, scores)
+
+        result[start:start + chunk] = np.round(scores, 2)
+
+    return result
+
+
+def armour_terms(weights: Optional[list[float]] = None,
+                 features: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the protection of every piece of armour in CATALOGUE["armour"], from the first two stats of
+    NORMALIZATION_DATA_CLOTH, and the burden it adds to a score when it is too heavy for the character, from the
+    last, both weighted by weights (WEIGHT_CLOTH by default). Given an array with a row of weights per build,
+    both have a row per build. features stand in for the cached armour_features if given.
+    """
+    weights = np.asarray(WEIGHT_CLOTH if weights is None else weights, dtype=float)
+    if features is None:
+        features = armour_features()
+
+    if weights.ndim > 1:
+        return (features[:, :2] @ weights[:, :2].T).T, weights[:, 2:] * features[:, 2]
+    return features[:, :2] @ weights[:2], weights[2] * features[:, 2]
+
+
+def preference_matches(table: ItemTable, column: str, preferences: list[list[str]]) -> np.ndarray:
+    """
+    Returns, for each list of playstyle preferences, which rows of table have a value of column among them,
+    with a row per list. Each distinct list is only matched against the table once.
+    """
+    matched = {}
+    rows = []
+    for preference in preferences:
+        key = tuple(preference)
+        if key not in matched:
+            matched[key] = table.matches(column, list(preference))
+        rows.append(matched[key])
+
+    return np.array(rows, dtype=bool).reshape(len(preferences), len(table))
+
+
+def get_cloth_score(session: Session, name: str, cloth_type: str) -> float:
     sum_so_far = 0.0
-    armour = get_details(name, cloth_type, "armour")
+    armour, features = catalogue_view("armour")
+    row = get_row(name, cloth_type, "armour", armour)
 
-    for index in range(2):
-        sum_so_far += WEIGHT_CLOTH[index] * (
-                float(armour[NORMALIZATION_DATA_CLOTH[index][0]]) - NORMALIZATION_DATA_CLOTH[index][1]) / (
-                              NORMALIZATION_DATA_CLOTH[index][2] - NORMALIZATION_DATA_CLOTH[index][1])
+    # the terms of this piece alone
+    protection, burden = armour_terms(features=features[row:row + 1])
+    sum_so_far += protection[0]
 
-    if (150 + int(SPECIALDICT["STR"]) * 10) / 8 <= float(armour["Weight"]):
-        sum_so_far += WEIGHT_CLOTH[2] * (
-                float(armour[NORMALIZATION_DATA_CLOTH[2][0]]) - NORMALIZATION_DATA_CLOTH[2][1]) / (
-                              NORMALIZATION_DATA_CLOTH[2][2] - NORMALIZATION_DATA_CLOTH[2][1])
+    if derive_stats(session.special).carry_weight / 8 <= armour.number(row, "Weight"):
+        sum_so_far += burden[0]
 
-    if "Yes" in PLAYSTYLE_PREFERENCES and "stealth" in name.lower():
+    if "Yes" in session.preferences and "stealth" in name.lower():
         sum_so_far += 3
 
     return round(sum_so_far, 2)
 
 
+def rank_top(session: Session, k: int = RANK_LIMIT) -> dict[str, dict[str, dict[str, float]]]:
+    """
+    Returns the k best weapons of each weapon skill, k best weapons of each weapon category and k best pieces of
+    armour of each armour category for the character of session, under "skills", "weapons" and "armour", best
+    first. Only the weapons of the character's best weapon skills are ranked: every weapon skill within
+    SKILL_MARGIN points of the highest.
+
+    Only the k best items of each group are ever sorted, so the ranking stays cheap however large the catalogue.
+    """
+    weapon_scores, armour_scores = cached_scores(session.build())
+    return _rank_scores([session], weapon_scores[np.newaxis], armour_scores[np.newaxis], k)[0]
+
+
+def _rank_scores(sessions: list[Session], weapon_scores: np.ndarray, armour_scores: np.ndarray,
+                 k: int) -> list[dict[str, dict[str, dict[str, float]]]]:
+    """
+    Returns the rank_top of each of sessions from its scores, a row of weapon_scores and of armour_scores.
+
+    Every group is ranked for all the sessions at once, and each session then keeps the weapon groups of its
+    own best weapon skills. A weapon category belongs to a single weapon skill, so this ranks the same weapons
+    as leaving the others out first.
+    """
+    weapons = CATALOGUE["weapons"]
+    armour = CATALOGUE["armour"]
+    category_skills = [category.split(" -")[0].capitalize() for category in weapons.category_names]
+    skills = np.array(category_skills)[weapons.categories]
+    weapon_categories = np.array(weapons.category_names)[weapons.categories]
+    armour_categories = np.array(armour.category_names)[armour.categories]
+    skill_of = dict(zip(weapons.category_names, category_skills))
+
+    rankings = []
+    for session, by_skill, by_category, by_armour in zip(
+            sessions, top_groups(weapon_scores, weapons.names, skills, k),
+            top_groups(weapon_scores, weapons.names, weapon_categories, k),
+            top_groups(armour_scores, armour.names, armour_categories, k)):
+        best_skill = max(session.skills[skill] for skill in by_skill)
+        kept = {skill for skill in by_skill if best_skill - session.skills[skill] <= SKILL_MARGIN}
+        rankings.append({"skills": {skill: top for skill, top in by_skill.items() if skill in kept},
+                         "weapons": {category: top for category, top in by_category.items()
+                                     if skill_of[category] in kept},
+                         "armour": by_armour})
+
+    return rankings
+
+
+def rank_sessions(sessions: list[Session], k: int = RANK_LIMIT,
+                  workers: Optional[int] = None) -> list[dict[str, dict[str, dict[str, float]]]]:
+    """
+    Returns the rank_top of every session, in order. The scores of all the sessions are fetched first as one
+    batch (see cached_scores_batch), then ranked RANK_BATCH sessions at a time on a pool of workers threads.
+    """
+    scores = cached_scores_batch([session.build() for session in sessions])
+    if not scores:
+        return []
+
+    weapon_scores = np.stack([weapons for weapons, _ in scores])
+    armour_scores = np.stack([armour for _, armour in scores])
+    batches = range(0, len(sessions), RANK_BATCH)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ranked = pool.map(lambda start: _rank_scores(sessions[start:start + RANK_BATCH],
+                                                     weapon_scores[start:start + RANK_BATCH],
+                                                     armour_scores[start:start + RANK_BATCH], k), batches)
+        return [ranking for batch in ranked for ranking in batch]
+
+
+def top_groups(scores: np.ndarray, names: list[str], groups: np.ndarray,
+               k: int) -> dict[str, dict[str, float]] | list[dict[str, dict[str, float]]]:
+    """
+    Returns the names and scores of the k highest scoring items of each group, best first, with the groups in
+    the order they first appear in groups. If scores is 2-D, returns them for each of its rows, in order.
+    """
+    matrix = np.atleast_2d(scores)
+    rankings = [{} for _ in matrix]
+    for group in dict.fromkeys(groups.tolist()):
+        rows = np.flatnonzero(groups == group)
+        columns = rows[top_k(matrix[:, rows], k)]
+        for ranking, row_columns, row_scores in zip(rankings, columns.tolist(),
+                                                    np.take_along_axis(matrix, columns, axis=1).tolist()):
+            ranking[group] = {names[column]: score for column, score in zip(row_columns, row_scores)}
+
+    return rankings if scores.ndim > 1 else rankings[0]
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the columns of the k highest scores in each row of scores, or in scores itself if it is 1-D, highest
+    first. Ties go to the lower column and NaN scores come last.
+
+    The k best are picked with numpy.argpartition, so only they are sorted.
+
+    >>> top_k(np.array([1.0, 3.0, 2.0, 3.0]), 2).tolist()
+    [1, 3]
+    >>> top_k(np.array([[1.0, 3.0, 2.0], [5.0, 4.0, 5.0]]), 2).tolist()
+    [[1, 2], [0, 2]]
+    """
+    matrix = np.atleast_2d(np.where(np.isnan(scores), -np.inf, scores))
+    k = min(k, matrix.shape[1])
+    if k == 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=int)
+
+    # the k-th highest score of each row; every score above it is kept, and as many ties with it as still fit
+    kth = np.take_along_axis(matrix, np.argpartition(-matrix, k - 1, axis=1)[:, k - 1:k], axis=1)
+    above = matrix > kth
+    tied = (matrix == kth) & (np.cumsum(matrix == kth, axis=1) <= k - above.sum(axis=1, keepdims=True))
+    columns = np.nonzero(above | tied)[1].reshape(len(matrix), k)
+
+    # a stable sort keeps tied columns in order
+    order = np.argsort(-np.take_along_axis(matrix, columns, axis=1), axis=1, kind="stable")
+    columns = np.take_along_axis(columns, order, axis=1)
+
+    return columns if scores.ndim > 1 else columns[0]
+
+
 if __name__ == "__main__":
     # requirement for "code quality"
     "code-checking tools"
@@ -662,37 +1264,18 @@ if __name__ == "__main__":
     get_rest("data/weapons")
     get_rest("data/armour")
 
-    main()
-
-    weps = {}
-    types = ["Unarmed", "Melee weapons", "Guns", "Energy weapons", "Explosives"]
-    max_skill = max([SKILLS[x].get() for x in types])
-
-    types = [x for x in types if abs(SKILLS[x].get() - max_skill) <= 10]
+    session = main()
 
-    cloths = {}
-
-    for t in EQUIPMENT["armour"]:
-        for item in EQUIPMENT["armour"][t]:
-            cloths[item["Name"]] = get_cloth_score(item["Name"], t)
-
-    result = dict(sorted(cloths.items(), key=lambda item: item[1]))
+    ranking = rank_top(session)
 
     with open("output/PlayerInfo.txt", "a") as log_file:
-        print("\nWeapons:\n", file=log_file)
-        pprint.pprint(result, stream=log_file, sort_dicts=False)
+        print(f"\nWeapons (best {RANK_LIMIT} of each skill):\n", file=log_file)
+        pprint.pprint(ranking["skills"], stream=log_file, sort_dicts=False)
         print("", file=log_file)
         print("---------------", file=log_file)
 
-    for t in EQUIPMENT["weapons"]:
-        if t.split(" -")[0].capitalize() in types:
-            for item in EQUIPMENT["weapons"][t]:
-                weps[item["Name"]] = get_wep_score(item["Name"], t)
-
-    result = dict(sorted(weps.items(), key=lambda item: item[1]))
-
     with open("output/PlayerInfo.txt", "a") as log_file:
-        print("\nArmour:\n", file=log_file)
-        pprint.pprint(result, stream=log_file, sort_dicts=False)
+        print(f"\nArmour (best {RANK_LIMIT} of each category):\n", file=log_file)
+        pprint.pprint(ranking["armour"], stream=log_file, sort_dicts=False)
         print("", file=log_file)
         print("---------------", file=log_file)
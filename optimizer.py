@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import bisect
+import math
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Any, Optional
+
+import numpy as np
+
+import main_test
+from classes import Session
+from stats import CRIT_TRAIT, SKILL_STATS, SPECIAL, SPECIAL_POINTS, STAT_RANGE, derive_stats, starting_skills
+
+# The only trait the scores depend on; every other trait pair scores the same as taking no trait.
+SCORED_TRAIT = CRIT_TRAIT
+
+# The column that names the ammunition of a weapon, how much a secondary weapon counts towards a loadout's
+# score, and the weight columns of weapons and armour.
+AMMO_COLUMN = "Ammunition"
+SECONDARY_WEIGHT = 0.5
+WEAPON_WEIGHT_COLUMN = "Weapon weight"
+ARMOUR_WEIGHT_COLUMN = "Weight"
+
+# How many S.P.E.C.I.A.L. distributions optimize_builds searches at once.
+SEARCH_CHUNK = 4096
+
+
+def special_distributions() -> np.ndarray:
+    """
+    Returns every valid S.P.E.C.I.A.L. distribution, one row per distribution with the columns in the order of
+    SPECIAL, sorted lexicographically.
+
+    >>> distributions = special_distributions()
+    >>> bool((distributions.sum(axis=1) == SPECIAL_POINTS).all())
+    True
+    """
+    low, high = STAT_RANGE
+    free = np.indices((high - low + 1,) * (len(SPECIAL) - 1)).reshape(len(SPECIAL) - 1, -1).T + low
+    last = SPECIAL_POINTS - free.sum(axis=1)
+    valid = (last >= low) & (last <= high)
+
+    return np.column_stack([free[valid], last[valid]])
+
+
+def trait_names() -> list[str]:
+    """
+    Returns the name of every trait in main_test.EQUIPMENT["traits"], as the character allocator offers them.
+    """
+    names = []
+    for category, traits in main_test.EQUIPMENT.get("traits", {}).items():
+        dlc = category.split(" - ")[-1]
+        names += [trait["Name"] if dlc == "vanilla" else f"[{dlc.title()}] {trait['Name']}" for trait in traits]
+
+    return names
+
+
+def weapon_skills() -> list[str]:
+    """
+    Returns the skills of the weapons in main_test.CATALOGUE["weapons"], in the order of SKILL_STATS.
+    """
+    weapons = main_test.CATALOGUE["weapons"]
+    skills = {category.split(" -")[0] for category in weapons.category_names}
+
+    return [skill for skill in SKILL_STATS if skill in skills]
+
+
+def weapon_tables(preferences: list[str], processes: int = 1) -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
+    """
+    Returns, for each weapon skill, the best weapon score of that skill and the catalogue row of the weapon that
+    scores it, for every combination of the stats a weapon score depends on.
+
+    A weapon score only depends on the character through its skill, the strength or perception behind it, AGL,
+    LCK and whether it has SCORED_TRAIT, and the skill itself only on the stat it starts from, LCK and whether it
+    is tagged. Each table is indexed [stat, tagged, STR or PER, AGL, LCK, trait] with stats counted from 1, so
+    every character is scored by looking it up instead of going through the catalogue again.
+
+    With processes above 1, the tables are filled by that many processes, one LCK value at a time.
+    """
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes, initializer=main_test.share_catalogue,
+                                 initargs=(main_test.CATALOGUE, main_test.FEATURES, main_test.BOUNDS)) as executor:
+            parts = list(executor.map(_weapon_tables, range(STAT_RANGE[0], STAT_RANGE[1] + 1),
+                                      [preferences] * (STAT_RANGE[1] - STAT_RANGE[0] + 1)))
+    else:
+        parts = [_weapon_tables(luck, preferences) for luck in range(STAT_RANGE[0], STAT_RANGE[1] + 1)]
+
+    best = {skill: np.stack([part[0][skill] for part in parts], axis=4) for skill in parts[0][0]}
+    rows = {skill: np.stack([part[1][skill] for part in parts], axis=4) for skill in parts[0][1]}
+
+    return best, rows
+
+
+def _weapon_tables(luck: int, preferences: list[str]) -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
+    """
+    Returns the weapon_tables for characters with the given LCK, without the LCK axis.
+    """
+    weapons = main_test.CATALOGUE["weapons"]
+    skill_of_row = np.array([category.split(" -")[0] for category in weapons.category_names])[weapons.categories]
+
+    stats = range(STAT_RANGE[0], STAT_RANGE[1] + 1)
+    keys = [(stat, tagged, strength, agility, trait)
+            for stat in stats for tagged in (0, 1) for strength in stats for agility in stats for trait in (0, 1)]
+
+    # every skill is set from the same stat, so each build stands for that stat behind every skill at once
+    builds = [{"special": dict.fromkeys(SPECIAL, STAT_RANGE[0]) | {"STR": strength, "PER": strength,
+                                                                   "AGL": agility, "LCK": luck},
+               "skills": derive_stats(dict.fromkeys(SPECIAL, stat) | {"LCK": luck},
+                                      SKILL_STATS if tagged else ()).skills,
+               "traits": [SCORED_TRAIT] if trait else [],
+               "preferences": preferences}
+              for stat, tagged, strength, agility, trait in keys]
+    scores = main_test.score_weapon_builds(builds)
+
+    shape = (len(stats), 2, len(stats), len(stats), 2)
+    best, rows = {}, {}
+    for skill in weapon_skills():
+        columns = np.flatnonzero(skill_of_row == skill)
+        rows[skill] = columns[np.argmax(scores[:, columns], axis=1)].reshape(shape)
+        best[skill] = scores[:, columns].max(axis=1).reshape(shape)
+
+    return best, rows
+
+
+def armour_table(preferences: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the best armour score for each STR, counted from 1, and the catalogue row of the armour that scores it.
+    An armour score depends on nothing else about the character.
+    """
+    stats = range(STAT_RANGE[0], STAT_RANGE[1] + 1)
+    scores = main_test.score_armour_builds([{"special": dict.fromkeys(SPECIAL, strength), "preferences": preferences}
+                                            for strength in stats])
+
+    return scores.max(axis=1), np.argmax(scores, axis=1)
+
+
+def optimize_builds(preferences: list[str], k: int = 10, traits: Optional[list[str]] = None,
+                    processes: int = 1) -> list[dict[str, Any]]:
+    """
+    Returns the k best characters for the given playstyle preferences over every valid S.P.E.C.I.A.L.
+    distribution, choice of three tagged skills and pair of traits, best first. A character scores the score
+    of its best weapon plus that of its best armour, as scored by main_test.score_builds.
+
+    Only the tagged weapon skills and whether SCORED_TRAIT is taken change a score, and of the tags only those
+    that change the best weapon, so each result stands for every character with the same S.P.E.C.I.A.L., the
+    same choice about SCORED_TRAIT and the same best weapon at the same score: it holds the one with the fewest
+    tagged weapon skills, its other tags taken in the order of SKILL_STATS, and "equivalent", how many
+    characters it stands for. Ties are broken by S.P.E.C.I.A.L. distribution, then tags, then traits, so the
+    results do not change from one run to the next.
+
+    Distributions are searched SEARCH_CHUNK at a time, from the highest bound on what any choice of tags can
+    score with them down, until the bound of the next one falls below the k-th best result found.
+
+    Each result is a build, in the form taken by main_test.score_builds, with its "score", "weapon" and
+    "armour". traits defaults to every trait of trait_names, and processes is passed to weapon_tables.
+
+    Preconditions:
+        - the equipment has been loaded, e.g. by main_test.load_equipment
+        - k >= 1
+    """
+    if "weapons" not in main_test.CATALOGUE or "armour" not in main_test.CATALOGUE:
+        main_test.build_catalogue()
+
+    traits = [trait for trait in (trait_names() if traits is None else traits) if trait != "No Trait"]
+    unscored = len([trait for trait in traits if trait != SCORED_TRAIT])
+    skills = weapon_skills()
+    others = [skill for skill in SKILL_STATS if skill not in skills]
+    scored = (0, 1) if SCORED_TRAIT in traits else (0,)
+
+    weapon_best, weapon_rows = weapon_tables(preferences, processes)
+    armour_best, armour_rows = armour_table(preferences)
+
+    special = special_distributions()
+    index = {stat: special[:, column] - STAT_RANGE[0] for column, stat in enumerate(SPECIAL)}
+    armour_scores = armour_best[index["STR"]]
+
+    def lookup(skill: str, tagged: int, trait: int, distributions: np.ndarray) -> tuple:
+        strength = index["STR"] if "Melee" in skill else index["PER"]
+        return (index[SKILL_STATS[skill]][distributions], tagged, strength[distributions],
+                index["AGL"][distributions], index["LCK"][distributions], trait)
+
+    everything = np.arange(len(special))
+    # the most any choice of tags scores, for each trait choice (rows) and distribution (columns)
+    bounds = np.array([np.max([weapon_best[skill][lookup(skill, tagged, trait, everything)]
+                               for skill in skills for tagged in (0, 1)], axis=0) + armour_scores
+                       for trait in scored])
+
+    choices = [(tags, trait) for size in range(min(3, len(skills)) + 1) for tags in combinations(skills, size)
+               for trait in scored if len(others) >= 3 - size]
+    # which weapon skills each choice tags, and how many ways there are to pick its other tags
+    tagging = np.array([[skill in tags for skill in skills] for tags, _ in choices]).reshape(len(choices), -1)
+    ways = np.array([math.comb(len(others), 3 - len(tags)) for tags, _ in choices])
+
+    pairs = np.argsort(-bounds, axis=None, kind="stable")
+    found = []  # the _distinct_choices of each chunk searched, by trait choice
+    threshold = -np.inf
+    for first in range(0, len(pairs), SEARCH_CHUNK):
+        if bounds.flat[pairs[first]] < threshold:
+            break
+
+        chunk = pairs[first:first + SEARCH_CHUNK]
+        for position, trait in enumerate(scored):
+            distributions = chunk[chunk // len(special) == position] % len(special)
+            if len(distributions) == 0:
+                continue
+
+            mine = np.array([choice_trait == trait for _, choice_trait in choices])
+            found.append(_distinct_choices(
+                np.array([[weapon_best[skill][lookup(skill, tagged, trait, distributions)] for skill in skills]
+                          for tagged in (0, 1)]),
+                np.array([[weapon_rows[skill][lookup(skill, tagged, trait, distributions)] for skill in skills]
+                          for tagged in (0, 1)]),
+                tagging[mine], np.flatnonzero(mine), ways[mine], armour_scores[distributions], distributions))
+
+        kept = np.concatenate([part[0] for part in found])
+        if len(kept) >= k:
+            threshold = np.partition(kept, len(kept) - k)[len(kept) - k]
+
+    scores, distributions, chosen, rows, counts = (np.concatenate(parts) for parts in zip(*found))
+    order = np.lexsort((chosen, distributions, -scores))[:k]
+
+    results = []
+    for position in order:
+        tags, trait = choices[chosen[position]]
+        stats = dict(zip(SPECIAL, (int(value) for value in special[distributions[position]])))
+        tagged = tags + tuple(others[:3 - len(tags)])
+
+        results.append({"special": stats,
+                        "skills": starting_skills(stats, tagged),
+                        "traits": [SCORED_TRAIT if trait else "No Trait", "No Trait"],
+                        "preferences": preferences,
+                        "score": round(float(scores[position]), 2),
+                        "weapon": main_test.CATALOGUE["weapons"].names[rows[position]],
+                        "armour": main_test.CATALOGUE["armour"].names[armour_rows[stats["STR"] - STAT_RANGE[0]]],
+                        "equivalent": int(counts[position]) * _trait_pairs(unscored, trait)})
+
+    return results
+
+
+def _distinct_choices(best: np.ndarray, rows: np.ndarray, tagging: np.ndarray, choices: np.ndarray,
+                      ways: np.ndarray, armour_scores: np.ndarray,
+                      distributions: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    Returns the scores, distributions, choices, best weapon rows and number of characters of the distinct
+    results of optimize_builds for the given distributions, all with the same trait choice.
+
+    best and rows hold the best weapon score of each skill and its row, indexed [tagged, skill, distribution],
+    and tagging, which skills each of choices tags, one row per choice. Every choice of a distribution that
+    ends up with the same best weapon at the same score is one result, held by the first of those choices, and
+    counts the ways of all of them.
+    """
+    skill_index = np.arange(best.shape[1])[None, :, None]
+    tagged = tagging[:, :, None].astype(int)  # [choice, skill, 1]
+    values = best[tagged, skill_index, np.arange(best.shape[2])]  # [choice, skill, distribution]
+    winners = np.argmax(values, axis=1)[:, None, :]  # the first skill with the best weapon
+
+    scores = (np.take_along_axis(values, winners, axis=1)[:, 0] + armour_scores).ravel()
+    winner_tagged = np.take_along_axis(np.broadcast_to(tagged, values.shape), winners, axis=1)[:, 0]
+    weapons = rows[winner_tagged, winners[:, 0], np.arange(best.shape[2])].ravel()
+    columns = np.tile(np.arange(best.shape[2]), len(choices))
+    picked = np.repeat(choices, best.shape[2])
+
+    order = np.lexsort((picked, weapons, scores, columns))
+    key = np.column_stack([columns, scores, weapons])[order]
+    starts = np.flatnonzero(np.concatenate([[True], (key[1:] != key[:-1]).any(axis=1)]))
+    first = order[starts]
+
+    return (scores[first], distributions[columns[first]], picked[first], weapons[first],
+            np.add.reduceat(np.repeat(ways, best.shape[2])[order], starts))
+
+
+def _trait_pairs(unscored: int, scored: int) -> int:
+    """
+    Returns how many choices of at most two different traits there are out of unscored traits and SCORED_TRAIT,
+    with SCORED_TRAIT among them if scored and without it otherwise.
+    """
+    if scored:
+        return 1 + unscored
+    return 1 + unscored + math.comb(unscored, 2)
+
+
+def best_loadout(session: Session, capacity: Optional[float] = None,
+                 distinct_skill: bool = True, distinct_ammo: bool = True,
+                 companion_scores: Optional[dict[str, float]] = None) -> dict[str, Any]:
+    """
+    Returns the best loadout of a primary weapon, a secondary weapon, a piece of armour and a companion for the
+    character of session: its "primary", "secondary", "armour" and "companion", its "score" and the "weight"
+    carried.
+
+    A loadout scores its primary weapon, SECONDARY_WEIGHT times its secondary weapon, its armour and its
+    companion's entry in companion_scores, where companions missing from it score 0; the data has no companion
+    stats to score, so without companion_scores no companion is chosen and "companion" is None. The weapons
+    and armour must weigh no more than capacity, which defaults to the character's carry weight. With
+    distinct_skill, the two weapons must use different skills, and with distinct_ammo, they must not use the
+    same ammunition when the catalogue lists it in AMMO_COLUMN.
+
+    Weapons are tried best first and a branch is cut as soon as its bound cannot beat the best loadout so far;
+    the best armour within the weight left is found by binary search in a table of the best armour up to each
+    weight. Ties go to the items that come first in the catalogue.
+
+    Raises a ValueError if no loadout fits within capacity.
+
+    Preconditions:
+        - the equipment has been loaded, e.g. by main_test.load_equipment
+    """
+    if any(key not in main_test.CATALOGUE for key in ("weapons", "armour")):
+        main_test.build_catalogue()
+
+    build = session.build()
+    capacity = derive_stats(build["special"]).carry_weight if capacity is None else capacity
+
+    weapons = main_test.CATALOGUE["weapons"]
+    armour = main_test.CATALOGUE["armour"]
+    weapon_scores, armour_scores = (scores[0] for scores in main_test.score_builds([build]))
+    weapon_weights = weapons.column(WEAPON_WEIGHT_COLUMN)
+    skills = [category.split(" -")[0] for category in weapons.category_names]
+    ammo = [weapons.value(row, AMMO_COLUMN) if weapons.has(row, AMMO_COLUMN) else "" for row in range(len(weapons))]
+
+    # the best armour that weighs at most each armour weight, lightest first
+    by_weight = np.lexsort((np.arange(len(armour)), armour.column(ARMOUR_WEIGHT_COLUMN)))
+    armour_weights = armour.column(ARMOUR_WEIGHT_COLUMN)[by_weight].tolist()
+    lightest_best = []
+    for row in by_weight:
+        if not lightest_best or armour_scores[row] > armour_scores[lightest_best[-1]]:
+            lightest_best.append(row)
+        else:
+            lightest_best.append(lightest_best[-1])
+
+    companion, companion_score = _best_companion(companion_scores)
+
+    order = main_test.top_k(weapon_scores, len(weapons)).tolist()
+    best_armour = float(armour_scores.max()) if len(armour) else -np.inf
+    best = None
+    best_score = -np.inf
+
+    for primary in order:
+        if weapon_scores[primary] + SECONDARY_WEIGHT * weapon_scores[order[0]] + best_armour + companion_score \
+                <= best_score:
+            break
+
+        for secondary in order:
+            score = weapon_scores[primary] + SECONDARY_WEIGHT * weapon_scores[secondary]
+            if score + best_armour + companion_score <= best_score:
+                break
+            if secondary == primary or (distinct_skill and skills[weapons.categories[primary]] ==
+                                        skills[weapons.categories[secondary]]) or \
+                    (distinct_ammo and ammo[primary] and ammo[primary] == ammo[secondary]):
+                continue
+
+            left = capacity - weapon_weights[primary] - weapon_weights[secondary]
+            fits = bisect.bisect_right(armour_weights, left)
+            if fits == 0:
+                continue
+
+            worn = lightest_best[fits - 1]
+            if score + armour_scores[worn] + companion_score > best_score:
+                best_score = score + armour_scores[worn] + companion_score
+                best = (primary, secondary, worn)
+
+    if best is None:
+        raise ValueError(f"No loadout weighs at most {capacity}")
+
+    primary, secondary, worn = best
+    return {"primary": weapons.names[primary],
+            "secondary": weapons.names[secondary],
+            "armour": armour.names[worn],
+            "companion": companion,
+            "score": round(float(best_score), 2),
+            "weight": round(float(weapon_weights[primary] + weapon_weights[secondary]
+                                  + armour.column(ARMOUR_WEIGHT_COLUMN)[worn]), 2)}
+
+
+def _best_companion(companion_scores: Optional[dict[str, float]]) -> tuple[Optional[str], float]:
+    """
+    Returns the first of the highest scoring companions in main_test.CATALOGUE["companions"] and its score,
+    or None and 0 if no companion_scores are given or no companions are loaded.
+    """
+    companions = main_test.CATALOGUE.get("companions")
+    if not companion_scores or companions is None or len(companions) == 0:
+        return None, 0.0
+
+    scores = np.array([companion_scores.get(name, 0.0) for name in companions.names])
+    best = int(np.argmax(scores))
+
+    return companions.names[best], float(scores[best])
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+
+import main_test
+from classes import Session
+from stats import SPECIAL, STAT_RANGE, starting_skills
+
+# How many perturbed samples are scored at once; samples are split into chunks of this size whether or not
+# they are scored by a process pool, so a seed always gives the same results.
+SAMPLE_CHUNK = 512
+
+
+def perturb_weights(weights: list[float], scale: float, samples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Returns samples copies of weights, one per row, each weight multiplied by 1 plus normal noise with standard
+    deviation scale.
+    """
+    return np.asarray(weights, dtype=float) * (1 + scale * rng.standard_normal((samples, len(weights))))
+
+
+def perturb_special(special: dict[str, int], moves: int, samples: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Returns samples S.P.E.C.I.A.L. distributions, one per row with the columns in the order of SPECIAL, each
+    made from special by moving a point from one random stat to another moves times, keeping every stat within
+    STAT_RANGE.
+    """
+    low, high = STAT_RANGE
+    stats = np.tile(np.array([special[stat] for stat in SPECIAL]), (samples, 1))
+    rows = np.arange(samples)
+
+    for _ in range(moves):
+        # random keys, with the stats that cannot give or take a point pushed to the bottom
+        donor = np.argmax(np.where(stats > low, rng.random(stats.shape), -1.0), axis=1)
+        keys = np.where(stats < high, rng.random(stats.shape), -1.0)
+        keys[rows, donor] = -1.0
+        recipient = np.argmax(keys, axis=1)
+
+        movable = (stats[rows, donor] > low) & (keys[rows, recipient] >= 0)
+        stats[rows[movable], donor[movable]] -= 1
+        stats[rows[movable], recipient[movable]] += 1
+
+    return stats
+
+
+def sensitivity(session: Session, samples: int = 10000, weight_scale: float = 0.1,
+                special_moves: int = 1, seed: int = 0, processes: int = 1,
+                k: int = main_test.RANK_LIMIT) -> dict[str, dict[str, Any]]:
+    """
+    Returns how stable the ranking of the weapons and of the armour of the character of session is when
+    WEIGHT_WEPS, WEIGHT_CLOTH and the S.P.E.C.I.A.L. change slightly, estimated from samples random
+    perturbations of all three (see perturb_weights and perturb_special).
+
+    For each of "weapons" and "armour", returns the "top" item of the unperturbed scores, its "stability", the
+    share of samples in which it stays on top, and the "items" with the k highest win probabilities, best
+    first, each with its "win_probability", "mean_rank" (1 being the best) and "rank_sd".
+
+    Each chunk of SAMPLE_CHUNK samples is scored with a single call to main_test.score_builds, with a row of
+    weights per sample, and with processes above 1, chunks are scored by that many processes. The results only
+    depend on seed, not on processes.
+
+    Preconditions:
+        - the equipment has been loaded, e.g. by main_test.load_equipment
+        - samples >= 1
+    """
+    if "weapons" not in main_test.FEATURES or "armour" not in main_test.FEATURES:
+        main_test.build_catalogue()
+
+    build = session.build()
+    chunks = [min(SAMPLE_CHUNK, samples - start) for start in range(0, samples, SAMPLE_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes, initializer=main_test.share_catalogue,
+                                 initargs=(main_test.CATALOGUE, main_test.FEATURES, main_test.BOUNDS)) as executor:
+            parts = list(executor.map(_sample, [build] * len(chunks), chunks, seeds, [weight_scale] * len(chunks),
+                                      [special_moves] * len(chunks)))
+    else:
+        parts = [_sample(build, size, chunk_seed, weight_scale, special_moves)
+                 for size, chunk_seed in zip(chunks, seeds)]
+
+    report = {}
+    for kind, scores in zip(("weapons", "armour"), main_test.score_builds([build])):
+        wins, rank_sum, rank_squares = (sum(part[kind][index] for part in parts) for index in range(3))
+        mean_rank = rank_sum / samples
+        rank_sd = np.sqrt(np.maximum(rank_squares / samples - mean_rank ** 2, 0.0))
+        names = main_test.CATALOGUE[kind].names
+        top = int(main_test.top_k(scores[0], 1)[0])
+
+        report[kind] = {"top": names[top],
+                        "stability": float(wins[top] / samples),
+                        "items": {names[row]: {"win_probability": float(wins[row] / samples),
+                                               "mean_rank": float(mean_rank[row] + 1),
+                                               "rank_sd": float(rank_sd[row])}
+                                  # by wins, then by mean rank, which is always under len(names)
+                                  for row in main_test.top_k(wins - mean_rank / len(names), k)}}
+
+    return report
+
+
+def _sample(build: dict[str, Any], samples: int, seed: np.random.SeedSequence, weight_scale: float,
+            special_moves: int) -> dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Scores samples perturbations of build and returns, for "weapons" and for "armour", how many times each item
+    came first, and the sum of its ranks and of their squares, counting ranks from 0.
+    """
+    rng = np.random.default_rng(seed)
+
+    # whatever the skills get on top of what the S.P.E.C.I.A.L. gives them, such as tags, goes with them
+    start = starting_skills(build["special"])
+    extra = {skill: build["skills"][skill] - value for skill, value in start.items()}
+
+    builds = []
+    for stats in perturb_special(build["special"], special_moves, samples, rng):
+        special = dict(zip(SPECIAL, (int(value) for value in stats)))
+        skills = starting_skills(special)
+        builds.append({"special": special, "skills": {skill: skills[skill] + extra[skill] for skill in skills},
+                       "traits": build["traits"], "preferences": build["preferences"]})
+
+    weapon_weights = perturb_weights(main_test.WEIGHT_WEPS, weight_scale, samples, rng)
+    armour_weights = perturb_weights(main_test.WEIGHT_CLOTH, weight_scale, samples, rng)
+    scores = main_test.score_builds(builds, weapon_weights=weapon_weights, armour_weights=armour_weights)
+
+    result = {}
+    for kind, matrix in zip(("weapons", "armour"), scores):
+        order = np.argsort(-np.where(np.isnan(matrix), -np.inf, matrix), axis=1, kind="stable")
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.arange(matrix.shape[1]), axis=1)
+
+        result[kind] = (np.bincount(order[:, 0], minlength=matrix.shape[1]).astype(float),
+                        ranks.sum(axis=0).astype(float), (ranks.astype(float) ** 2).sum(axis=0))
+
+    return result
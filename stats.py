@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Iterable, Mapping, NamedTuple
+
+# The S.P.E.C.I.A.L. stats, in the order the allocators show them.
+SPECIAL = ["STR", "PER", "END", "CHR", "INT", "AGL", "LCK"]
+
+# The S.P.E.C.I.A.L. stat each skill starts from, in the order the allocators show them.
+SKILL_STATS = {
+    "Barter": "CHR",
+    "Energy weapons": "PER",
+    "Explosives": "PER",
+    "Guns": "AGL",
+    "Lockpick": "PER",
+    "Medicine": "INT",
+    "Melee weapons": "STR",
+    "Repair": "INT",
+    "Science": "INT",
+    "Sneak": "AGL",
+    "Speech": "CHR",
+    "Survival": "END",
+    "Unarmed": "END",
+}
+
+# How many S.P.E.C.I.A.L. points a character spends, and the bounds of each stat.
+SPECIAL_POINTS = 40
+STAT_RANGE = (1, 10)
+
+# The ranges a character can prefer, as offered by the preference allocator.
+RANGE_OPTIONS = ["Close Range", "Mid Range", "Long Range", "Traps"]
+
+# Points added to each of the three tagged skills.
+TAG_BONUS = 15
+
+# The trait that raises critical chance, and by how many percentage points.
+CRIT_TRAIT = "Built to Destroy"
+CRIT_TRAIT_BONUS = 3
+
+# How many distinct characters derive_stats remembers.
+DERIVED_CACHE_SIZE = 1 << 16
+
+
+class DerivedStats(NamedTuple):
+    """
+    The stats that follow from a character's S.P.E.C.I.A.L., tagged skills and traits.
+
+    Instance Attributes:
+        - skills: the starting value of every skill, read-only
+        - action_points: the character's action points
+        - crit_chance: the character's critical chance, as a fraction
+        - carry_weight: how much weight the character can carry
+    """
+    skills: Mapping[str, int]
+    action_points: int
+    crit_chance: float
+    carry_weight: int
+
+
+def derive_stats(special: Mapping[str, int], tagged: Iterable[str] = (), traits: Iterable[str] = ()) -> DerivedStats:
+    """
+    Returns the DerivedStats of a character with the given S.P.E.C.I.A.L., tagged skills and traits.
+
+    Results are cached, so asking again for a character seen recently costs a dictionary lookup; the order of
+    tagged and the traits other than CRIT_TRAIT make no difference.
+
+    >>> stats = derive_stats({"STR": 5, "PER": 5, "END": 5, "CHR": 5, "INT": 5, "AGL": 9, "LCK": 5}, ["Guns"])
+    >>> stats.skills["Guns"], stats.action_points, stats.carry_weight
+    (38, 92, 200)
+    """
+    return _derive_stats(tuple(int(special[stat]) for stat in SPECIAL), frozenset(tagged), CRIT_TRAIT in traits)
+
+
+@lru_cache(maxsize=DERIVED_CACHE_SIZE)
+def _derive_stats(special: tuple[int, ...], tagged: frozenset[str], crit_trait: bool) -> DerivedStats:
+    """
+    Returns the DerivedStats of derive_stats, for special in the order of SPECIAL.
+    """
+    stats = dict(zip(SPECIAL, special))
+    skills = {skill: 2 + (2 * stats[stat]) + math.ceil(stats["LCK"] / 2) + TAG_BONUS * (skill in tagged)
+              for skill, stat in SKILL_STATS.items()}
+
+    return DerivedStats(skills=MappingProxyType(skills),
+                        action_points=65 + 3 * stats["AGL"],
+                        crit_chance=(stats["LCK"] + CRIT_TRAIT_BONUS * crit_trait) / 100,
+                        carry_weight=150 + stats["STR"] * 10)
+
+
+def starting_skills(special: Mapping[str, int], tagged: Iterable[str] = ()) -> dict[str, int]:
+    """
+    Returns the starting value of every skill for a character with the given S.P.E.C.I.A.L., with TAG_BONUS
+    added to the tagged skills.
+
+    >>> starting_skills({"STR": 5, "PER": 5, "END": 5, "CHR": 5, "INT": 5, "AGL": 9, "LCK": 5}, ("Guns",))["Guns"]
+    38
+    """
+    return dict(derive_stats(special, tagged).skills)
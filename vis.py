@@ -1,5 +1,13 @@
+import hashlib
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Collection, Optional
+
 import networkx as nx
-from plotly.graph_objs import Scatter, Figure
+import numpy as np
+from plotly.graph_objs import Scatter, Scattergl, Figure
 
 from classes import Graph
 
@@ -16,54 +24,136 @@ VERTEX_BORDER_COLOUR = 'rgb(50, 50, 50)'
 BOOK_COLOUR = 'rgb(89, 205, 105)'
 USER_COLOUR = 'rgb(105, 89, 205)'
 
+# Where computed layouts are kept, and the component size above which the 'auto' layout stops using
+# spring_layout, whose cost grows with the square of the number of vertices.
+LAYOUT_CACHE_DIRECTORY = 'cache/layouts'
+LARGE_COMPONENT = 500
+
+# The number of points above which graphs are drawn with WebGL rather than SVG.
+WEBGL_THRESHOLD = 2000
+
+
+def graph_fingerprint(graph_nx: nx.Graph, layout: str) -> str:
+    """
+    Returns a hash that changes whenever layout, the vertices of graph_nx, their order or its edges change.
+    """
+    digest = hashlib.sha256(layout.encode())
+    digest.update(repr(list(graph_nx.nodes)).encode())
+    digest.update(repr(list(graph_nx.edges(data='weight'))).encode())
+    return digest.hexdigest()
+
+
+def compute_layout(graph_nx: nx.Graph, layout: str = 'auto', use_cache: bool = True) -> dict[Any, np.ndarray]:
+    """
+    Returns the position of every vertex of graph_nx.
+
+    layout is either 'auto', which picks a layout that scales to large graphs (see auto_layout), or the name
+    of a networkx layout function. Positions are cached in LAYOUT_CACHE_DIRECTORY under the fingerprint of
+    the graph, so laying out an unchanged graph again only reads them back.
+    """
+    path = os.path.join(LAYOUT_CACHE_DIRECTORY, graph_fingerprint(graph_nx, layout) + '.npy')
+
+    if use_cache and os.path.exists(path):
+        positions = np.load(path)
+        if positions.shape == (len(graph_nx), 2):
+            return dict(zip(graph_nx.nodes, positions))
+
+    if layout == 'auto':
+        pos = auto_layout(graph_nx)
+    else:
+        pos = getattr(nx, layout)(graph_nx)
+
+    if use_cache:
+        # written under a unique name first, since several render_batch workers may share the cache
+        os.makedirs(LAYOUT_CACHE_DIRECTORY, exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.npy'
+        np.save(temporary, np.array([pos[k] for k in graph_nx.nodes], dtype=float).reshape(-1, 2))
+        os.replace(temporary, path)
+
+    return pos
+
+
+def auto_layout(graph_nx: nx.Graph) -> dict[Any, np.ndarray]:
+    """
+    Returns positions for graph_nx that stay quick to compute on large graphs.
+
+    Each connected component is laid out on its own: small ones with a seeded spring_layout, and ones larger
+    than LARGE_COMPONENT with spectral_layout, which uses a sparse eigensolver. The components are then
+    packed into a grid, largest first.
+    """
+    order = {node: index for index, node in enumerate(graph_nx.nodes)}
+    components = sorted(nx.connected_components(graph_nx), key=lambda c: (-len(c), min(order[k] for k in c)))
+    side = max(math.ceil(math.sqrt(len(components))), 1)
+    pos = {}
+
+    for index, component in enumerate(components):
+        subgraph = graph_nx.subgraph(sorted(component, key=order.__getitem__))
+
+        if len(subgraph) <= 2:
+            sub_pos = nx.circular_layout(subgraph)
+        elif len(subgraph) <= LARGE_COMPONENT:
+            sub_pos = nx.spring_layout(subgraph, seed=0)
+        else:
+            sub_pos = nx.spectral_layout(subgraph)
+
+        sub_pos = nx.rescale_layout_dict(sub_pos, scale=0.45)
+        offset = np.array([index % side, -(index // side)], dtype=float)
+        pos.update((k, np.asarray(p, dtype=float) + offset) for k, p in sub_pos.items())
+
+    return pos
+
 def setup_graph(graph: Graph,
-                layout: str = 'spring_layout',
+                layout: str = 'auto',
                 max_vertices: int = 5000) -> list:
-    graph_nx = graph.to_networkx(max_vertices)
-    pos = getattr(nx, layout)(graph_nx)
+    return graph_traces(graph.to_networkx(max_vertices), layout)
 
-    x_values = [pos[k][0] for k in graph_nx.nodes]
-    y_values = [pos[k][1] for k in graph_nx.nodes]
-    labels = list(graph_nx.nodes)
 
-    kinds = [graph_nx.nodes[k]['kind'] for k in graph_nx.nodes]
-    effective_ranges = [', '.join(graph_nx.nodes[k].get('effective_ranges', [])) for k in graph_nx.nodes]
-    associated_skills = [graph_nx.nodes[i].get('skill') for i in graph_nx.nodes]
-
-    colours = [BOOK_COLOUR if kind == 'book' else USER_COLOUR for kind in kinds]
-
-    x_edges = []
-    y_edges = []
-
-    for edge in graph_nx.edges:
-        x1, x2 = pos[edge[0]][0], pos[edge[1]][0]
-        x_edges += [x1, x2, None]
-        y1, y2 = pos[edge[0]][1], pos[edge[1]][1]
-        y_edges += [y1, y2, None]
-
-    trace3 = Scatter(x=x_edges,
-                     y=y_edges,
-                     mode='lines+text',
-                     name='edges',
-                     line=dict(color=LINE_COLOUR, width=1),
-                     )
-
-    hover_texts = [f"{label}<br>Effective Range(s): {ranges}" for label, ranges in zip(labels, effective_ranges)]
-    hover_texts = [f"{label}<br>Associated Skill: {skill}" for label, skill in zip(hover_texts, associated_skills)]
-
-    trace4 = Scatter(x=x_values,
-                     y=y_values,
-                     mode='markers',
-                     name='nodes',
-                     marker=dict(symbol='circle-dot',
-                                 size=5,
-                                 color=colours,
-                                 line=dict(color=VERTEX_BORDER_COLOUR, width=0.5)
-                                 ),
-                     text=hover_texts,
-                     hovertemplate='%{text}',
-                     hoverlabel={'namelength': 0}
-                     )
+def graph_traces(graph_nx: nx.Graph, layout: str = 'auto') -> list:
+    """
+    Returns the plotly traces that draw graph_nx with the given layout.
+    """
+    pos = compute_layout(graph_nx, layout)
+
+    labels = list(graph_nx.nodes)
+    index = {k: i for i, k in enumerate(labels)}
+    coordinates = np.array([pos[k] for k in labels], dtype=float).reshape(-1, 2)
+
+    # each edge is drawn as its two ends followed by a gap
+    edges = np.array([(index[u], index[v]) for u, v in graph_nx.edges], dtype=np.int64).reshape(-1, 2)
+    segments = np.full((len(edges), 3, 2), np.nan)
+    segments[:, 0] = coordinates[edges[:, 0]]
+    segments[:, 1] = coordinates[edges[:, 1]]
+
+    hover_texts = []
+    colours = []
+    for label, attributes in graph_nx.nodes(data=True):
+        ranges = ', '.join(attributes.get('effective_ranges', []))
+        hover_texts.append(f"{label}<br>Effective Range(s): {ranges}<br>Associated Skill: {attributes.get('skill')}")
+        colours.append(BOOK_COLOUR if attributes['kind'] == 'book' else USER_COLOUR)
+
+    # SVG traces slow to a crawl past a few thousand points, so larger graphs are drawn with WebGL
+    trace_type = Scattergl if len(labels) + len(edges) > WEBGL_THRESHOLD else Scatter
+
+    trace3 = trace_type(x=segments[:, :, 0].ravel(),
+                        y=segments[:, :, 1].ravel(),
+                        mode='lines+text',
+                        name='edges',
+                        line=dict(color=LINE_COLOUR, width=1),
+                        )
+
+    trace4 = trace_type(x=coordinates[:, 0],
+                        y=coordinates[:, 1],
+                        mode='markers',
+                        name='nodes',
+                        marker=dict(symbol='circle-dot',
+                                    size=5,
+                                    color=colours,
+                                    line=dict(color=VERTEX_BORDER_COLOUR, width=0.5)
+                                    ),
+                        text=hover_texts,
+                        hovertemplate='%{text}',
+                        hoverlabel={'namelength': 0}
+                        )
 
     data = [trace3, trace4]
 
@@ -71,12 +161,16 @@ def setup_graph(graph: Graph,
 
 
 def visualize_graph(graph: Graph,
-                    layout: str = 'spring_layout',
+                    layout: str = 'auto',
                     max_vertices: int = 5000,
                     output_file: str = '') -> None:
     draw_graph(setup_graph(graph, layout, max_vertices), output_file)
 
 def draw_graph(data: list, output_file: str = '', weight_positions=None) -> None:
+    """
+    Draws data, showing it in a browser when output_file is empty and writing it to output_file otherwise.
+    A .html output_file is written as a self-contained page, which needs no image renderer.
+    """
     fig = Figure(data=data)
     fig.update_layout({'showlegend': False})
     fig.update_xaxes(showgrid=False, zeroline=False, visible=False)
@@ -93,5 +187,52 @@ def draw_graph(data: list, output_file: str = '', weight_positions=None) -> None
 
     if output_file == '':
         fig.show()
+    elif output_file.lower().endswith(('.html', '.htm')):
+        fig.write_html(output_file, include_plotlyjs=True, full_html=True)
     else:
         fig.write_image(output_file)
+
+
+def render_batch(jobs: list[tuple[Graph, Optional[dict[str, Collection]], str]],
+                 layout: str = 'auto',
+                 max_vertices: int = 5000,
+                 processes: Optional[int] = None) -> list[tuple[str, float]]:
+    """
+    Renders every (graph, vertex filter, output file) job on a pool of processes, and returns each output file
+    with the seconds its job took, in the order of jobs.
+
+    A vertex filter maps node attributes to the values to keep, e.g. {'skill': {'Guns'}} draws only the
+    vertices whose skill is Guns; None draws every vertex. Nothing is ever shown on screen, so every job needs
+    an output file. Workers share the layout cache, so a graph laid out by one job is read back by the others.
+
+    Preconditions:
+        - all(output_file != '' for _, _, output_file in jobs)
+    """
+    if any(output_file == '' for _, _, output_file in jobs):
+        raise ValueError('Every batch job needs an output file')
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        timings = [pool.submit(render_job, graph, vertex_filter, output_file, layout, max_vertices)
+                   for graph, vertex_filter, output_file in jobs]
+
+        return [(output_file, timing.result()) for (_, _, output_file), timing in zip(jobs, timings)]
+
+
+def render_job(graph: Graph,
+               vertex_filter: Optional[dict[str, Collection]],
+               output_file: str,
+               layout: str = 'auto',
+               max_vertices: int = 5000) -> float:
+    """
+    Draws the vertices of graph that pass vertex_filter to output_file, and returns how many seconds it took.
+    """
+    start = time.perf_counter()
+    graph_nx = graph.to_networkx(max_vertices)
+
+    if vertex_filter:
+        graph_nx = graph_nx.subgraph([k for k, attributes in graph_nx.nodes(data=True)
+                                      if all(attributes.get(key) in values for key, values in vertex_filter.items())])
+
+    draw_graph(graph_traces(graph_nx, layout), output_file)
+
+    return time.perf_counter() - start